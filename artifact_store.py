@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Any, Iterator
+
+import numpy as np
+
+import utils
+from vector_table import WordVectorTable
+
+MANIFEST_FILE = 'manifest.json'
+FORMAT_VERSION = 1
+
+class StringList:
+    # a list of strings stored as one UTF-8 blob plus an offsets array, both memory-mapped
+    def __init__(self, blob : np.ndarray, offsets : np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def save(strings : list[str], directory : str):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        with open(os.path.join(directory, 'strings.bin'), 'wb') as handle:
+            handle.write(b''.join(encoded))
+        np.save(os.path.join(directory, 'offsets.npy'), offsets)
+
+    @staticmethod
+    def load(directory : str) -> 'StringList':
+        offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r')
+        blob_file = os.path.join(directory, 'strings.bin')
+        if os.path.getsize(blob_file):
+            blob = np.memmap(blob_file, dtype=np.uint8, mode='r')
+        else:
+            blob = np.zeros(0, dtype=np.uint8)
+        return StringList(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('StringList index out of range')
+        return bytes(self.blob[self.offsets[item]:self.offsets[item + 1]]).decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_list()) # one decode of the whole blob, so list(string_list) stays fast
+
+    def to_list(self) -> list[str]:
+        data = bytes(self.blob)
+        offsets = self.offsets.tolist()
+        return [data[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+class ArtifactStore:
+    # Versioned store for the large objects we used to pickle. Word-vector tables are saved as a vocabulary
+    # file plus a float32 .npy matrix that loads memory-mapped, string lists as a blob plus offsets, anything
+    # else (classifiers) as a pickle. manifest.json records every version of every artifact.
+    def __init__(self, root : str):
+        self.root = root
+        self.manifest_file = os.path.join(root, MANIFEST_FILE)
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as handle:
+                self.manifest = json.load(handle)
+        else:
+            self.manifest = {'format_version':FORMAT_VERSION, 'artifacts':{}}
+
+    def _write_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as handle:
+            json.dump(self.manifest, handle, indent=1)
+        os.replace(tmp_file, self.manifest_file)
+
+    def __contains__(self, name : str) -> bool:
+        return name in self.manifest['artifacts']
+
+    def versions(self, name : str) -> list[dict]:
+        return self.manifest['artifacts'].get(name, [])
+
+    def save(self, name : str, obj : Any) -> int:
+        # returns the new version number
+        version = len(self.versions(name)) + 1
+        directory = os.path.join(self.root, name, f'v{version}')
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+        if isinstance(obj, WordVectorTable):
+            kind = 'vectors'
+            obj.save(directory)
+        elif isinstance(obj, dict) and obj and all([isinstance(v, np.ndarray) for v in obj.values()]):
+            kind = 'vectors'
+            WordVectorTable.from_dict(obj).save(directory)
+        elif hasattr(obj, 'index_to_key') and hasattr(obj, 'vectors'): # gensim KeyedVectors
+            kind = 'vectors'
+            WordVectorTable.from_keyed_vectors(obj).save(directory)
+        elif isinstance(obj, (list, StringList)) and all([isinstance(s, str) for s in obj]):
+            kind = 'strings'
+            StringList.save(list(obj), directory)
+        else:
+            kind = 'pickle'
+            utils.p_save(obj, os.path.join(directory, 'object.p'))
+        entry = {'version':version, 'kind':kind, 'path':os.path.relpath(directory, self.root),
+                 'created':time.strftime('%Y-%m-%d %H:%M:%S'), 'python':sys.version.split()[0]}
+        if kind == 'pickle':
+            entry['sha1'] = utils.file_hash(os.path.join(directory, 'object.p'))
+        self.manifest['artifacts'].setdefault(name, []).append(entry)
+        self._write_manifest()
+        return version
+
+    def load(self, name : str, version : int = None, mmap : bool = True) -> Any:
+        # latest version unless one is given
+        if name not in self:
+            raise Exception(f'Artifact "{name}" not in store {self.root}')
+        entries = self.versions(name)
+        entry = entries[-1] if version is None else [e for e in entries if e['version'] == version][0]
+        directory = os.path.join(self.root, entry['path'])
+        if entry['kind'] == 'vectors':
+            return WordVectorTable.load(directory, mmap)
+        if entry['kind'] == 'strings':
+            return StringList.load(directory)
+        object_file = os.path.join(directory, 'object.p')
+        if utils.file_hash(object_file) != entry['sha1']:
+            raise Exception(f'Artifact "{name}" v{entry["version"]} does not match its manifest checksum')
+        return utils.p_load(object_file)
+
+    def load_or_import(self, name : str, pickle_file : str, **kwargs) -> Any:
+        # first use imports an existing utils.p_save pickle into the store
+        if name not in self:
+            self.save(name, utils.p_load(pickle_file))
+        return self.load(name, **kwargs)
+
+if __name__ == "__main__":
+    # python artifact_store.py STORE_DIR name=file.p [name=file.p ...]
+    store = ArtifactStore(sys.argv[1])
+    for arg in sys.argv[2:]:
+        name, pickle_file = arg.split('=', 1)
+        version = store.save(name, utils.p_load(pickle_file))
+        print(f'{pickle_file} -> {name} v{version} ({store.versions(name)[-1]["kind"]})')
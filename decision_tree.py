@@ -1,10 +1,12 @@
+import concurrent.futures
 import dataclasses
 import itertools
 import math
 
-from collections import Counter
+from collections import Counter, deque
 from typing import ClassVar, Callable, Any
 
+import numpy as np
 import pandas as pd
 
 def population_to_percentages(pop_list : list) -> list[float]:
@@ -32,6 +34,89 @@ def condition2str(feature : str, condition : bool, value : Any) -> str:
         return ("" if condition == value else "!") + feature
     return f'{feature}{"==" if condition else "!="}{str(value)}'
 
+def _encode_column(values : list) -> tuple[np.ndarray, list]:
+    # integer codes in order of first appearance, plus the value behind each code
+    code_dict = {}
+    codes = np.fromiter((code_dict.setdefault(v, len(code_dict)) for v in values), dtype=np.intp, count=len(values))
+    return codes, list(code_dict.keys())
+
+def _first_seen_order(codes : np.ndarray) -> np.ndarray:
+    uniq, first_index = np.unique(codes, return_index=True)
+    return uniq[np.argsort(first_index)]
+
+@dataclasses.dataclass
+class _EncodedDataset:
+    features : list[str]
+    columns : list[tuple[np.ndarray, list]]
+    outcomes : np.ndarray
+    outcome_values : list
+
+    @staticmethod
+    def from_dataframe(df : pd.DataFrame, outcome_column : str) -> '_EncodedDataset':
+        features = [k for k in df.columns if k != outcome_column]
+        outcomes, outcome_values = _encode_column(list(df[outcome_column]))
+        return _EncodedDataset(features, [_encode_column(list(df[k])) for k in features], outcomes, outcome_values)
+
+@dataclasses.dataclass
+class _GrowthSettings:
+    population_metric : Callable[[list], float]
+    max_depth : int | None = None
+    min_samples_leaf : int = 1
+    min_gain : float = 0.0
+
+def _best_feature_split(data : _EncodedDataset, f : int, rows : np.ndarray, ys : np.ndarray, y_counts : list[int],
+                        current_score : float, settings : _GrowthSettings) -> tuple[float, Any, np.ndarray] | None:
+    # (score, value, row mask) of the first best split on feature f that beats current_score
+    codes, values = data.columns[f]
+    n_outcomes = len(data.outcome_values)
+    xs = codes[rows]
+    value_codes = _first_seen_order(xs).tolist()
+    if len(value_codes) < 2:
+        return None
+    n_values = len(values)
+    joint = np.bincount(xs * n_outcomes + ys, minlength=n_values * n_outcomes).reshape(n_values, n_outcomes)
+    # position of the first row with each (value, outcome), len(rows) if there is none
+    first = np.full(n_values * n_outcomes, len(rows))
+    uniq, first_index = np.unique(xs * n_outcomes + ys, return_index=True)
+    first[uniq] = first_index
+    first = first.reshape(n_values, n_outcomes)
+    # first row with each outcome and a different value: the smallest first position, unless it is ours
+    first_sorted = np.sort(first, axis=0)
+    first_other = np.where(np.argmin(first, axis=0) == np.arange(n_values)[:, None],
+                           first_sorted[1] if n_values > 1 else len(rows), first_sorted[0])
+    value_sizes = joint.sum(axis=1).tolist()
+    joint_other = np.asarray(y_counts) - joint
+    joint, joint_other = joint.tolist(), joint_other.tolist()
+    first, first_other = first.tolist(), first_other.tolist()
+    best = None
+    best_score = current_score
+    value_dict = {values[c]:c for c in value_codes}
+    for value in set(value_dict.keys()):
+        v = value_dict[value]
+        if min(value_sizes[v], len(rows) - value_sizes[v]) < settings.min_samples_leaf:
+            continue
+        distributions = []
+        for counts, positions in ((joint[v], first[v]), (joint_other[v], first_other[v])):
+            present = [k for k in range(n_outcomes) if counts[k]]
+            present.sort(key=lambda k : positions[k])
+            c_sum = sum([counts[k] for k in present])
+            distributions.append([counts[k] / c_sum for k in present])
+        score = sum([settings.population_metric(d) for d in distributions]) / 2
+        if score < best_score:
+            best_score = score
+            best = (score, value, v)
+    if best is None:
+        return None
+    return best[0], best[1], xs == best[2]
+
+_tree_worker_state : dict = {}
+
+def _init_tree_worker(data : _EncodedDataset, settings : _GrowthSettings):
+    _tree_worker_state.update({'data':data, 'settings':settings})
+
+def _grow_in_tree_worker(rows : np.ndarray, depth : int) -> 'FeatureDecisionTree':
+    return FeatureDecisionTree._from_encoded(_tree_worker_state['data'], rows, depth, _tree_worker_state['settings'])
+
 @dataclasses.dataclass
 class FeatureDecisionTree:
     feature : str
@@ -66,6 +151,15 @@ class FeatureDecisionTree:
 
         if outcome_column not in df.columns:
             raise Exception('Outcomes column "%s" not in dataframe' % outcome_column)
+        if kwargs.get('backend', 'numpy') == 'numpy':
+            # min_samples_leaf, min_gain and n_jobs are only supported by this backend
+            settings = _GrowthSettings(population_metric, max_depth, kwargs.get('min_samples_leaf') or 1,
+                                       kwargs.get('min_gain') or 0.0)
+            data = _EncodedDataset.from_dataframe(df, outcome_column)
+            n_jobs = kwargs.get('n_jobs')
+            if n_jobs is not None and n_jobs > 1:
+                return FeatureDecisionTree._from_encoded_parallel(data, np.arange(len(df)), depth, settings, n_jobs)
+            return FeatureDecisionTree._from_encoded(data, np.arange(len(df)), depth, settings)
         feature_dict = {k:set(df[k]) for k in df.columns if k != outcome_column}
         y_population = Counter(df[outcome_column])
         y_sum = sum(y_population.values())
@@ -98,10 +192,90 @@ class FeatureDecisionTree:
                 best_df_true, best_df_false = best_df_false, best_df_true
             for k, _df in zip((True, False), (best_df_true, best_df_false)):
                 node.children[k] = FeatureDecisionTree.from_dataset(_df, outcome_column,
-                                        population_metric, depth=depth+1, max_depth=max_depth)
+                                        population_metric, depth=depth+1, max_depth=max_depth, backend='pandas')
 
         return node
 
+    @staticmethod
+    def _split_node(data : _EncodedDataset, rows : np.ndarray, depth : int, settings : '_GrowthSettings',
+                    executor : concurrent.futures.Executor = None) \
+            -> tuple['FeatureDecisionTree', np.ndarray | None, np.ndarray | None]:
+        # the node for these rows, plus the rows of its (True, False) children if it splits
+        ys = data.outcomes[rows]
+        n_outcomes = len(data.outcome_values)
+        y_counts = np.bincount(ys, minlength=n_outcomes).tolist()
+        y_sum = len(rows)
+        y_probabilities = {data.outcome_values[k]:y_counts[k]/y_sum for k in _first_seen_order(ys).tolist()}
+        current_score = settings.population_metric(y_probabilities.values())
+        node = FeatureDecisionTree(feature=None, value=None, outcome_probabilities=y_probabilities,
+                                   depth=depth, score=current_score)
+        if settings.max_depth is not None and depth >= settings.max_depth:
+            return node, None, None
+        # find feature by which to split; per-feature winners are reduced in feature order, so ties
+        # go to the same (feature, value) as a single sequential scan
+        jobs = [(data, f, rows, ys, y_counts, current_score, settings) for f in range(len(data.features))]
+        if executor is None:
+            splits = [_best_feature_split(*job) for job in jobs]
+        else:
+            splits = list(executor.map(lambda job : _best_feature_split(*job), jobs))
+        best_score = current_score
+        best_feature, best_value = None, None
+        best_mask = None
+        for f, split in enumerate(splits):
+            if split is not None and split[0] < best_score:
+                best_score, best_value, best_mask = split
+                best_feature = data.features[f]
+        if best_feature is None or current_score - best_score <= settings.min_gain:
+            return node, None, None
+        node.feature, node.value = best_feature, best_value
+        rows_true, rows_false = rows[best_mask], rows[~best_mask]
+        if isinstance(node.value, bool) and node.value is False: # none of this A==False stuff
+            node.value = True
+            rows_true, rows_false = rows_false, rows_true
+        return node, rows_true, rows_false
+
+    @staticmethod
+    def _from_encoded(data : _EncodedDataset, rows : np.ndarray, depth : int, settings : '_GrowthSettings',
+                      executor : concurrent.futures.Executor = None) -> 'FeatureDecisionTree':
+        # same tree as the DataFrame version: children get row index arrays instead of DataFrame copies, and
+        # split histograms come from np.bincount; the metric still sees probabilities in first-appearance order
+        node, rows_true, rows_false = FeatureDecisionTree._split_node(data, rows, depth, settings, executor)
+        if rows_true is not None:
+            for k, _rows in zip((True, False), (rows_true, rows_false)):
+                node.children[k] = FeatureDecisionTree._from_encoded(data, _rows, depth+1, settings, executor)
+        return node
+
+    @staticmethod
+    def _from_encoded_parallel(data : _EncodedDataset, rows : np.ndarray, depth : int, settings : '_GrowthSettings',
+                               n_jobs : int) -> 'FeatureDecisionTree':
+        # The top of the tree, where nodes hold the most rows, is grown breadth first in this process with
+        # candidate features scored in a thread pool. Once there are n_jobs open subtrees, each is grown
+        # sequentially in a process pool.
+        root = None
+        pending = deque([(None, None, rows, depth)]) # (parent, branch, rows, depth)
+        with concurrent.futures.ThreadPoolExecutor(n_jobs) as threads:
+            while pending and len(pending) < n_jobs:
+                parent, branch, _rows, _depth = pending.popleft()
+                node, rows_true, rows_false = FeatureDecisionTree._split_node(data, _rows, _depth, settings, threads)
+                if parent is None:
+                    root = node
+                else:
+                    parent.children[branch] = node
+                if rows_true is not None:
+                    pending.extend([(node, True, rows_true, _depth+1), (node, False, rows_false, _depth+1)])
+        if not pending:
+            return root
+        with concurrent.futures.ProcessPoolExecutor(n_jobs, initializer=_init_tree_worker,
+                                                    initargs=(data, settings)) as processes:
+            futures = [(parent, branch, processes.submit(_grow_in_tree_worker, _rows, _depth))
+                       for parent, branch, _rows, _depth in pending]
+            for parent, branch, future in futures:
+                if parent is None:
+                    root = future.result()
+                else:
+                    parent.children[branch] = future.result()
+        return root
+
     def find_outcome(self, features_dict : dict[str, Any]) -> dict[str, float]:
         node = self
         while not node.is_leaf() and node.feature in features_dict:
@@ -118,12 +292,93 @@ class FeatureDecisionTree:
                 outcomes.append((population, outcome_list))
         return outcomes
 
+    def compile(self, outcomes : list) -> 'CompiledFeatureDecisionTree':
+        return CompiledFeatureDecisionTree.from_tree(self, outcomes)
+
+@dataclasses.dataclass
+class CompiledFeatureDecisionTree:
+    # the tree flattened into parallel arrays, node 0 is the root and leaves have feature_index -1
+    features : list[str]
+    feature_index : np.ndarray
+    split_values : list
+    true_child : np.ndarray
+    false_child : np.ndarray
+    probabilities : np.ndarray # one row per node, columns in outcomes order
+    populations : list[dict[Any, float]]
+    predictions : list
+    outcomes : list
+
+    @staticmethod
+    def from_tree(tree : FeatureDecisionTree, outcomes : list) -> 'CompiledFeatureDecisionTree':
+        nodes = [tree]
+        for node in nodes: # breadth first, nodes grows as we go
+            if not node.is_leaf():
+                nodes.extend([node[True], node[False]])
+        node_ids = {id(node):i for i, node in enumerate(nodes)}
+        features = list(dict.fromkeys([node.feature for node in nodes if not node.is_leaf()]))
+        feature_index = np.array([-1 if node.is_leaf() else features.index(node.feature) for node in nodes],
+                                 dtype=np.intp)
+        true_child = np.array([-1 if node.is_leaf() else node_ids[id(node[True])] for node in nodes], dtype=np.intp)
+        false_child = np.array([-1 if node.is_leaf() else node_ids[id(node[False])] for node in nodes], dtype=np.intp)
+        probabilities = np.array([[node.outcome_probabilities.get(k, 0.0) for k in outcomes] for node in nodes],
+                                 dtype=float).reshape(len(nodes), len(outcomes))
+        predictions = []
+        for node in nodes: # highest probability first, ties in dict order, as FeatureDecisionTreeClassifier.predict
+            items = list(node.outcome_probabilities.items())
+            items.sort(key=lambda t : -t[1])
+            predictions.append(items[0][0] if items else None)
+        return CompiledFeatureDecisionTree(features, feature_index, [node.value for node in nodes],
+                                           true_child, false_child, probabilities,
+                                           [node.outcome_probabilities for node in nodes], predictions, outcomes)
+
+    def route(self, X : pd.DataFrame) -> np.ndarray:
+        # node reached by every row, moving all rows that are still at internal nodes down one level at a time
+        n = len(X)
+        # per feature, which split (node) value every row is equal to, -1 for none
+        value_codes = np.full((n, len(self.features)), -1, dtype=np.intp)
+        split_codes = np.full(len(self.feature_index), -1, dtype=np.intp)
+        can_split = self.feature_index >= 0
+        for f, feature in enumerate(self.features):
+            nodes = np.flatnonzero(self.feature_index == f)
+            if feature not in X.columns: # find_outcome stops at nodes whose feature is missing
+                can_split[nodes] = False
+                continue
+            column = X[feature].to_numpy()
+            values = []
+            for node in nodes.tolist():
+                value = self.split_values[node]
+                if value not in values:
+                    values.append(value)
+                    matches = column == value
+                    if np.ndim(matches) == 0:
+                        matches = np.full(n, bool(matches))
+                    value_codes[np.asarray(matches, dtype=bool), f] = len(values) - 1
+                split_codes[node] = values.index(value)
+        node_ids = np.zeros(n, dtype=np.intp)
+        active = np.arange(n) if can_split[0] else np.arange(0)
+        while active.size:
+            nodes = node_ids[active]
+            go_true = value_codes[active, self.feature_index[nodes]] == split_codes[nodes]
+            node_ids[active] = np.where(go_true, self.true_child[nodes], self.false_child[nodes])
+            active = active[can_split[node_ids[active]]]
+        return node_ids
+
+    def predict_population(self, X : pd.DataFrame) -> list[dict[Any, float]]:
+        return [self.populations[i] for i in self.route(X).tolist()]
+
+    def predict_proba(self, X : pd.DataFrame) -> np.ndarray:
+        return self.probabilities[self.route(X)]
+
+    def predict(self, X : pd.DataFrame) -> list:
+        return [self.predictions[i] for i in self.route(X).tolist()]
+
 class FeatureDecisionTreeClassifier:
     OUTCOMES = '*OUTCOMES*'
     def __init__(self):
         self.tree : FeatureDecisionTree = None
         self.features : list[str] = None
         self.outcomes : list = None
+        self.compiled : CompiledFeatureDecisionTree = None
 
     def fit(self, X : pd.DataFrame|list[list], y : list, **kwargs) -> 'FeatureDecisionTreeClassifier':
         features = kwargs.get('features')
@@ -155,34 +410,49 @@ class FeatureDecisionTreeClassifier:
         df = pd.DataFrame(X)
         df[FeatureDecisionTreeClassifier.OUTCOMES] = y
         self.tree = FeatureDecisionTree.from_dataset(df, FeatureDecisionTreeClassifier.OUTCOMES,
-                                                     population_metric, max_depth=max_depth)
+                                                     population_metric, max_depth=max_depth,
+                                                     backend=kwargs.get('backend', 'numpy'),
+                                                     min_samples_leaf=kwargs.get('min_samples_leaf'),
+                                                     min_gain=kwargs.get('min_gain'), n_jobs=kwargs.get('n_jobs'))
         self.outcomes = list(set(y))
+        self.compiled = None
         return self
 
+    def compile(self) -> CompiledFeatureDecisionTree:
+        if not self.tree:
+            raise Exception('Model not fitted.')
+        self.compiled = self.tree.compile(self.outcomes)
+        return self.compiled
+
+    def _to_dataframe(self, X : pd.DataFrame|list[list]) -> pd.DataFrame:
+        if isinstance(X, pd.DataFrame):
+            return X
+        if len({len(row) for row in X}) != 1:
+            raise Exception('Multiple row lengths.')
+        if len(X[0]) != len(self.features):
+            raise Exception('Number of columns not equal to number of features')
+        return pd.DataFrame(X, columns=self.features)
+
     def predict_population(self, X : pd.DataFrame|list[list]) -> list[dict[str, float]]:
         if not self.tree:
             raise Exception('Model not fitted.')
-        if not isinstance(X, pd.DataFrame):
-            if len({len(row) for row in X}) != 1:
-                raise Exception('Multiple row lengths.')
-            if len(X[0]) != len(self.features):
-                raise Exception('Number of columns not equal to number of features')
-            X = pd.DataFrame(X, columns=self.features)
-        results = list(X.apply(lambda r : self.tree.find_outcome(r), axis=1))
-        return results
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.predict_population(self._to_dataframe(X))
 
     def predict_proba(self, X : pd.DataFrame|list[list]) -> list[list[float]]:
-        results = self.predict_population(X)
-        results = [[d[k] if k in d else 0.0 for k in self.outcomes] for d in results]
-        return results
+        if not self.tree:
+            raise Exception('Model not fitted.')
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.predict_proba(self._to_dataframe(X)).tolist()
 
     def predict(self, X : pd.DataFrame|list[list]) -> list:
-        probs = self.predict_population(X)
-        # get feature with highest probability
-        probs = [list(d.items()) for d in probs]
-        for d in probs:
-            d.sort(key=lambda t : -t[1]) # highest first
-        return [t[0][0] for t in probs]
+        if not self.tree:
+            raise Exception('Model not fitted.')
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.predict(self._to_dataframe(X))
 
     def score(self, X : pd.DataFrame|list[list], y : list) -> float:
         predictions = self.predict(X)
@@ -0,0 +1,44 @@
+import itertools
+import os
+import time
+
+import pandas as pd
+
+import ro_phon
+from decision_tree import FeatureDecisionTree
+from word import Word
+
+def toy_table(copies : int) -> pd.DataFrame:
+    # the decision_tree.py __main__ data, repeated
+    df = pd.DataFrame(list(itertools.product(*([(False,True)]*3))) * copies, columns=list('ABC'))
+    df['f'] = df.apply(lambda r: '1' if ((r['A'] or r['B']) and not r['C']) else '0', axis=1)
+    return df
+
+def sound_table(filename : str = './data/subst_phon_syll.csv') -> pd.DataFrame:
+    # one row of Sound features per phoneme of every word, outcome is whether the syllable is stressed
+    df = pd.read_csv(filename, sep='\t', encoding='utf-8')
+    rows = []
+    for ortho in df['ORTHO']:
+        word = Word.from_string(ortho.replace('â', 'î'), set(ro_phon.vowels), stress_token="'")
+        rows.extend([ph.to_dict() for ph in word])
+    return pd.DataFrame(rows).drop(columns=['word_index'])
+
+def time_tree(df : pd.DataFrame, outcome_column : str, **kwargs) -> float:
+    start = time.perf_counter()
+    FeatureDecisionTree.from_dataset(df, outcome_column, **kwargs)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    n_jobs = os.cpu_count()
+    configurations = [('pandas (original)', {'backend':'pandas'}),
+                      ('numpy', {}),
+                      (f'numpy, n_jobs={n_jobs}', {'n_jobs':n_jobs}),
+                      ('numpy, min_samples_leaf=50', {'min_samples_leaf':50}),
+                      ('numpy, min_gain=0.01', {'min_gain':0.01})]
+    tables = [('toy x 5000', toy_table(5000), 'f', None),
+              ('subst_phon_syll sounds', sound_table(), 'stressed_syllable', 6)]
+    for table_name, df, outcome_column, max_depth in tables:
+        print(f'{table_name}: {len(df)} rows, {len(df.columns)-1} features, max_depth={max_depth}')
+        for config_name, kwargs in configurations:
+            seconds = time_tree(df, outcome_column, max_depth=max_depth, **kwargs)
+            print(f'\t{config_name}\t{seconds:.3f}s')
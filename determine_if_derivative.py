@@ -3,8 +3,9 @@ import pandas as pd
 from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
 from sklearn.linear_model import LogisticRegression
 import random
-import utils
-from gensim.models.keyedvectors import KeyedVectors
+
+from artifact_store import ArtifactStore
+from vector_table import WordVectorTable
 
 if __name__ == "__main__":
     # data_df = pd.read_csv('./data/is_derivative_data.csv', sep='\t', encoding='utf-8')
@@ -23,18 +24,13 @@ if __name__ == "__main__":
     data_df = df[['Sursa', 'Cuvant', 'Diminutiv']]
     data_df = data_df.dropna()
     print('Loading vectors')
-    word_vectors : KeyedVectors = utils.p_load('./language_models/corola.300.20.p')
-
-    src_vecs, der_vecs, delta_vecs, y = [], [], [], []
+    word_vectors : WordVectorTable = ArtifactStore('./artifacts').load_or_import('corola.300.20',
+                                                                                 './language_models/corola.300.20.p')
 
-    count = 0
-    for row in data_df.to_dict(orient='records'):
-        source, derivative, is_dim = row['Sursa'], row['Cuvant'], row['Diminutiv']
-        vecs = [word_vectors[word] if word in word_vectors else None for word in (source, derivative)]
-        if [v for v in vecs if v is None]:
-            continue
-        src_vec, der_vec = vecs
-        delta = der_vec - src_vec
-        for data_list, row in zip((src_vecs, der_vecs, delta_vecs, y), (src_vec, der_vec, delta, is_dim)):
-            data_list.append(row)
-        count += 1
+    # gather the rows of all pairs where both words have vectors
+    src_idx, der_idx = word_vectors.indices(data_df['Sursa'].tolist()), word_vectors.indices(data_df['Cuvant'].tolist())
+    found = (src_idx >= 0) & (der_idx >= 0)
+    src_vecs, der_vecs = word_vectors.matrix[src_idx[found]], word_vectors.matrix[der_idx[found]]
+    delta_vecs = der_vecs - src_vecs
+    y = data_df['Diminutiv'].to_numpy()[found]
+    count = int(found.sum())
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+
+import numpy as np
+
+EMBEDDING_CACHE_FILE = './.embedding_cache.db'
+SQL_BATCH = 500 # words per SELECT ... IN (...) query
+
+class EmbeddingCache:
+    # persistent word embeddings keyed by (model id, word), stored as float32 blobs in one sqlite file,
+    # so that runs over the same word lists only encode new words
+    def __init__(self, filename : str = EMBEDDING_CACHE_FILE):
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS embeddings (model TEXT NOT NULL, word TEXT NOT NULL, '
+                                'vector BLOB NOT NULL, PRIMARY KEY (model, word))')
+        self.connection.commit()
+
+    def get_many(self, model_id : str, words : list[str]) -> dict[str, np.ndarray]:
+        # cached vectors of those words that have one
+        found = {}
+        words = list(dict.fromkeys(words))
+        for start in range(0, len(words), SQL_BATCH):
+            batch = words[start:start + SQL_BATCH]
+            rows = self.connection.execute('SELECT word, vector FROM embeddings WHERE model = ? AND word IN (%s)'
+                                           % ','.join('?' * len(batch)), [model_id] + batch)
+            found.update({word:np.frombuffer(vector, dtype=np.float32) for word, vector in rows})
+        return found
+
+    def put_many(self, model_id : str, vectors : dict[str, np.ndarray]):
+        self.connection.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)',
+                                    [(model_id, word, np.asarray(vec, dtype=np.float32).tobytes())
+                                     for word, vec in vectors.items()])
+        self.connection.commit()
+
+    def count(self, model_id : str = None) -> int:
+        if model_id is None:
+            return self.connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        return self.connection.execute('SELECT COUNT(*) FROM embeddings WHERE model = ?', (model_id,)).fetchone()[0]
+
+    def clear(self, model_id : str = None):
+        if model_id is None:
+            self.connection.execute('DELETE FROM embeddings')
+        else:
+            self.connection.execute('DELETE FROM embeddings WHERE model = ?', (model_id,))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
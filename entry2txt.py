@@ -7,6 +7,7 @@ from lxml import etree
 import re
 
 import utils
+from word import Tokenizer
 
 BOLD = {'style': 'font-weight: bold'}, '#'
 UNDERLINE = {'style': 'text-decoration:underline'}, '_'
@@ -110,21 +111,10 @@ def check_syllables(word : str, stressed_letter_index : int) -> (str, int):
     return ('', -1)
 
 
+_symbol_tokenizer = Tokenizer(['e̯', 'i̯', 'o̯', 'u̯'])
+
 def str_to_symbol_list(s : str) -> list[str]:
-    mult_char_symbols = ['e̯', 'i̯', 'o̯', 'u̯']
-    l = []
-    while s:
-        c_in_multi = False
-        for multi in mult_char_symbols:
-            if s.startswith(multi):
-                l.append(multi)
-                s = s[len(multi):]
-                c_in_multi = True
-                break
-        if not c_in_multi:
-            l.append(s[0])
-            s = s[1:]
-    return l
+    return _symbol_tokenizer(s)
 
 
 
@@ -200,7 +190,7 @@ def change_pl_stress(r : dict, sing_key_dict : dict[str, int]) -> tuple[str, boo
 
 
 if __name__ == "__main__":
-    df = pd.read_excel('./data/Nons_Phon_Syll5.xlsx')
+    df = utils.load_table('./data/Nons_Phon_Syll5.xlsx')
     df = df.fillna('')
 
 
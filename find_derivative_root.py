@@ -7,7 +7,12 @@ from numpy.linalg import norm
 
 import utils
 
-from string_distance import simple_string_distance as w_dist
+from string_distance import simple_string_distance as w_dist, batch_string_distance, CandidateBounds, \
+    cheap_positions, indel_cost_bound, OVER_THRESHOLD, BOUND_SLACK
+from suffix_trie import SuffixTrie
+from artifact_store import ArtifactStore
+from vector_table import WordVectorTable
+from vector_index import VectorIndex
 import sklearn
 
 
@@ -33,45 +38,142 @@ def vec_distance(a : np.ndarray, b : np.ndarray) -> float:
 def cos_distance(a : np.ndarray, b : np.ndarray) -> float:
     return 1 - float(np.dot(a,b)/(norm(a)*norm(b)))
 
+SCORE_BLOCK = 256 # candidates scored per batch_string_distance call, the best scores so far prune the next ones
+
+def _score_candidates(der_root : str, candidates : list[tuple[int, str]], bounds : CandidateBounds,
+                      found : list[tuple[int, float]], dist_cutoff : int, max_cost : float = None,
+                      excluded : set[int] = frozenset()) -> list[tuple[int, float]]:
+    # adds (i, distance) to found for the candidates (i, root) that can still be among the dist_cutoff best
+    # scores; bounds holds their roots. Candidates are scored lowest lower bound first, and only while
+    # their bound is under the current dist_cutoff-th best score.
+    def threshold() -> float:
+        if len(scores) < dist_cutoff:
+            return max_cost
+        return scores[dist_cutoff-1] if max_cost is None else min(max_cost, scores[dist_cutoff-1])
+    scores = sorted(set([d for _, d in found]))
+    lower = bounds.lower_bounds(der_root, threshold())
+    order = [r for r in np.argsort(lower, kind='stable').tolist() if candidates[r][0] not in excluded]
+    for start in range(0, len(order), SCORE_BLOCK):
+        block = order[start:start + SCORE_BLOCK]
+        cutoff = threshold()
+        if cutoff is not None:
+            block = [r for r in block if lower[r] <= cutoff + BOUND_SLACK]
+            if not block:
+                break
+        dists = batch_string_distance(der_root, [candidates[r][1] for r in block], substitution_costs, cutoff)
+        found.extend([(candidates[r][0], d) for r, d in zip(block, dists.tolist()) if d != OVER_THRESHOLD])
+        scores = sorted(set([d for _, d in found]))
+    return found
+
 def guess_source_by_edit_dist(deriative : str, suffix : str, candidates : list[str],
-                 dist_cutoff : float = 1) -> list[tuple[str, float]]:
+                 dist_cutoff : float = 1, max_cost : float = None) -> list[tuple[str, float]]:
     if not deriative.endswith(suffix):
         raise Exception('Derivative does not end in suffix')
     der_root = deriative[:-(len(suffix))]
     der_root = remove_final_vowels(der_root, 1)
     candidates = [c for c in candidates if c[0] == deriative[0]] # ?!?
-    candidates = [(c, w_dist(der_root, remove_final_vowels(c, 1), substitution_costs))
-                   for c in candidates if c != deriative]
-    if not candidates:
+    candidates = [c for c in candidates if c != deriative]
+    roots = [(i, remove_final_vowels(c, 1)) for i, c in enumerate(candidates)]
+    if not roots:
+        return []
+    found = _score_candidates(der_root, roots, CandidateBounds([r for _, r in roots], substitution_costs), [],
+                              dist_cutoff, max_cost)
+    if not found:
         return []
-    scores = list(set([t[-1] for t in candidates]))
-    scores.sort()
-    scores = scores[:dist_cutoff]
-    candidates = [t for t in candidates if t[-1] in scores]
-    candidates.sort(key=lambda t : t[-1])
-    return candidates
+    scores = sorted(set([t[-1] for t in found]))[:dist_cutoff]
+    found = [t for t in found if t[-1] in scores]
+    found.sort(key=lambda t : (t[-1], t[0])) # same order as a stable sort of the candidate list
+    return [(candidates[i], d) for i, d in found]
+
+class SourceIndex:
+    # nouns bucketed by first letter and root length, so that guess_source_by_edit_dist queries only
+    # score the buckets whose length-difference lower bound can still beat the best scores found.
+    # Within a bucket, the roots are pre-encoded for the CandidateBounds prefilter.
+    def __init__(self, nouns : list[str]):
+        self.nouns = nouns
+        self.buckets : dict[str, dict[int, list[tuple[int, str]]]] = {}
+        self.cheap_counts : dict[tuple[str, int], int] = {}
+        self.positions : dict[str, set[int]] = {}
+        for i, noun in enumerate(nouns):
+            root = remove_final_vowels(noun, 1)
+            self.buckets.setdefault(noun[0], {}).setdefault(len(root), []).append((i, root))
+            key = (noun[0], len(root))
+            self.cheap_counts[key] = max(self.cheap_counts.get(key, 0), cheap_positions(root))
+            self.positions.setdefault(noun, set()).add(i)
+        self.bounds = {(letter, root_len):CandidateBounds([root for _, root in bucket], substitution_costs)
+                       for letter, by_len in self.buckets.items() for root_len, bucket in by_len.items()}
+
+    def guess_source(self, deriative : str, suffix : str, dist_cutoff : float = 1,
+                     max_cost : float = None) -> list[tuple[str, float]]:
+        # same result as guess_source_by_edit_dist(deriative, suffix, self.nouns, dist_cutoff),
+        # optionally dropping candidates that cost more than max_cost
+        if not deriative.endswith(suffix):
+            raise Exception('Derivative does not end in suffix')
+        der_root = deriative[:-(len(suffix))]
+        der_root = remove_final_vowels(der_root, 1)
+        der_cheap_count = cheap_positions(der_root)
+        first_letter = deriative[0]
+        bucket_bounds = []
+        for root_len in self.buckets.get(first_letter, {}):
+            if root_len > len(der_root):
+                bound = indel_cost_bound(root_len - len(der_root), self.cheap_counts[(first_letter, root_len)])
+            else:
+                bound = indel_cost_bound(len(der_root) - root_len, der_cheap_count)
+            bucket_bounds.append((bound, root_len))
+        bucket_bounds.sort()
+        found : list[tuple[int, float]] = []
+        scores : list[float] = []
+        for bound, root_len in bucket_bounds:
+            if max_cost is not None and bound > max_cost + BOUND_SLACK:
+                break
+            if len(scores) >= dist_cutoff and bound > scores[dist_cutoff-1] + BOUND_SLACK:
+                break
+            found = _score_candidates(der_root, self.buckets[first_letter][root_len],
+                                      self.bounds[(first_letter, root_len)], found, dist_cutoff, max_cost,
+                                      self.positions.get(deriative, frozenset()))
+            scores = sorted(set([d for _, d in found]))
+        scores = scores[:dist_cutoff]
+        found = [t for t in found if t[-1] in scores]
+        found.sort(key=lambda t : (t[-1], t[0])) # same order as a stable sort of the noun list
+        return [(self.nouns[i], d) for i, d in found]
 
 def guess_source_by_wordvec(derivative : str, candidates : list[str],
-                            distance_metric : dict[tuple[str, str], float]) -> list[str]:
+                            distance_metric : dict[tuple[str, str], float] | WordVectorTable,
+                            metric : str = 'euclidean') -> list[str]:
                             # , wordvecs : dict[str, np.ndarray]) -> list[str]:
-    candidate_scores = [(c, distance_metric[(derivative, c)]) for c in candidates
-                        if distance_metric.get((derivative, c)) is not None]
+    # metric ('euclidean' or 'cosine') picks the distance computed from a WordVectorTable, matching the
+    # vec/cos pair tables it replaces; it is ignored for a precomputed distance dict
+    if isinstance(distance_metric, WordVectorTable): # vector distances computed on demand
+        if derivative not in distance_metric:
+            return []
+        dists = distance_metric.distances_to(derivative, candidates, metric).tolist()
+        candidate_scores = [(c, d) for c, d in zip(candidates, dists) if not math.isnan(d)]
+    else:
+        candidate_scores = [(c, distance_metric[(derivative, c)]) for c in candidates
+                            if distance_metric.get((derivative, c)) is not None]
     candidate_scores.sort(key=lambda t: t[-1])
     return [t[0] for t in candidate_scores]
 
+def guess_source_by_neighbours(derivative : str, index : VectorIndex, k : int = 10) -> list[tuple[str, float]]:
+    # semantic candidates without a pair distance table: the derivative's nearest nouns, closest first
+    return index.neighbours(derivative, k)
+
 MAX_DIST = 10
 
 if __name__ == "__main__":
+    store = ArtifactStore('./artifacts')
     print('Loading nouns')
-    nouns : list[str] = utils.p_load('./nouns_doom1.p')
+    nouns : list[str] = list(store.load_or_import('nouns_doom1', './nouns_doom1.p'))
+    source_index = SourceIndex(nouns)
     print('Loading pairs')
-    df_master = pd.read_csv('./data/derived_nouns_master.csv', sep='\t', encoding='utf-8')
+    df_master = utils.load_table('./data/derived_nouns_master.csv', sep='\t', encoding='utf-8')
     df_master = df_master.fillna('')
     print('Loading vectors')
-    noun_vecs : dict[str, np.ndarray] = utils.p_load('./word_vectors/nouns_w2v.corola-big.p')
+    noun_vecs : WordVectorTable = store.load_or_import('nouns_w2v.corola-big', './word_vectors/nouns_w2v.corola-big.p')
     # wordpair_dist : dict[tuple[str, str], float] = utils.p_load('./word_vectors/noun_vec_distances.corola-big.p')
     # wordpair_cos: dict[tuple[str, str], float] = utils.p_load('./word_vectors/noun_cos_distances.corola-big.p')
 
+    master_suffixes = SuffixTrie(['el', 'aș', 'șor'])
     data_rows = []
 
     for row in df_master.to_dict(orient='records'):
@@ -80,16 +182,13 @@ if __name__ == "__main__":
             source = source[2:]
         is_good = 1.0 if source else 0.0
         # chop off suffix
-        if deriv_word[-2:] in ('el', 'aș'):
-            suffix = deriv_word[-2:]
-        elif deriv_word[-3:] in ('șor'):
-            suffix = deriv_word[-3:]
-        else:
+        suffix = master_suffixes.longest_match(deriv_word, proper=False)
+        if suffix is None:
             raise Exception(f'Unknown suffix for {deriv_word}!')
         if suffix == deriv_word: # not the suffix itself
             continue
         if not source: # guess something
-            guesses = guess_source_by_edit_dist(deriv_word, suffix, nouns)
+            guesses = source_index.guess_source(deriv_word, suffix)
             source, edit_score = guesses[0] if guesses else ('', len(deriv_word))
         else: # get the edit score of the correct option
             der_root = deriv_word[:-(len(suffix))]
@@ -101,15 +200,15 @@ if __name__ == "__main__":
                      'word_len':len(deriv_word), 'word_len_nosuffix':len(deriv_word)-len(suffix),
                      'ln_word_len':math.log(len(deriv_word)),
                      'ln_word_len_nosuffix':math.log(len(deriv_word)-len(suffix))}
-        deriv_word_vec, source_vec = noun_vecs.get(deriv_word), noun_vecs.get(source)
-        if deriv_word_vec is None or source_vec is None:
-            vec_dist, cos_dist = None, None
-        else:
-            vec_dist, cos_dist = vec_distance(deriv_word_vec, source_vec), cos_distance(deriv_word_vec, source_vec)
-        data_dict.update({'vec_dist':vec_dist, 'cos_dist':cos_dist})
         print(deriv_word, is_good, source)
         data_rows.append(data_dict)
 
+    # vector distances of all (derivative, source) pairs at once; None where a word has no vector
+    deriv_words, sources = [d['word'] for d in data_rows], [d['source'] for d in data_rows]
+    for metric, key in (('euclidean', 'vec_dist'), ('cosine', 'cos_dist')):
+        for data_dict, dist in zip(data_rows, noun_vecs.pair_distances(deriv_words, sources, metric).tolist()):
+            data_dict[key] = None if math.isnan(dist) else dist
+
     df = pd.DataFrame(data_rows)
 
 
@@ -1,56 +1,134 @@
+import multiprocessing
+
 import numpy as np
 import pandas as pd
 from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
 from sklearn.linear_model import LogisticRegression
-import utils
 
-from find_derivative_root import guess_source_by_edit_dist, vec_distance
+from find_derivative_root import SourceIndex, vec_distance
+from suffix_trie import SuffixTrie, load_suffixes
+from artifact_store import ArtifactStore
+from vector_table import WordVectorTable
 
 import math
 
+def guess_candidate_source(word : str, suffix : str, source_index : SourceIndex) -> tuple:
+    guesses = source_index.guess_source(word, suffix)
+    return guesses[0] if guesses else (0, len(word))
+
+def candidate_features(word : str, edit_score : float, vec_dist : float | None) -> dict:
+    word_len = len(word)
+    return {'edit_score':edit_score, 'word_len':word_len, 'ln_word_len':math.log(word_len), 'vec_dist':vec_dist}
+
+def apply_models_batch(data_dicts : list[dict], model_list : list[dict]) -> list[tuple]:
+    # apply_models for many rows: each row goes to the first model (best score first) whose args are all
+    # available, then every model scores its rows in one predict_proba call. The class is the most
+    # probable one, which is what predict returns.
+    results = [('', 'n/a', -1)] * len(data_dicts)
+    todo = list(range(len(data_dicts)))
+    for model_dict in model_list:
+        if not todo:
+            break
+        args = model_dict['args']
+        usable = [r for r in todo if all([data_dicts[r][arg] is not None for arg in args])]
+        if not usable:
+            continue
+        model = model_dict['model']
+        probabilities = model.predict_proba([[data_dicts[r][arg] for arg in args] for r in usable])
+        classes = model.classes_[np.argmax(probabilities, axis=1)]
+        model_used = ', '.join(args)
+        for r, is_derivative, probability in zip(usable, classes, probabilities[:, 1]):
+            results[r] = (model_used, is_derivative, probability)
+        usable = set(usable)
+        todo = [r for r in todo if r not in usable]
+    return results
+
+def apply_models(data_dict : dict, model_list : list[dict]) -> tuple:
+    # first model (best score first) whose args are all available
+    return apply_models_batch([data_dict], model_list)[0]
+
+def classify_candidate(word : str, suffix : str, source_index : SourceIndex,
+                       noun_vecs : dict[str, np.ndarray] | WordVectorTable, model_list : list[dict]) -> tuple:
+    source, edit_score = guess_candidate_source(word, suffix, source_index)
+    word_vec = noun_vecs.get(word)
+    source_vec = noun_vecs.get(source)
+    vec_dist = vec_distance(word_vec, source_vec) if word_vec is not None and source_vec is not None else None
+    data_dict = candidate_features(word, edit_score, vec_dist)
+    return (word, suffix, source) + apply_models(data_dict, model_list)
+
+_worker_state : dict = {}
+
+def _init_worker(nouns : list[str]):
+    _worker_state.update({'source_index':SourceIndex(nouns)})
+
+def _guess_in_worker(job : tuple[str, str]) -> tuple:
+    return guess_candidate_source(*job, **_worker_state)
+
+def find_candidates(nouns : list[str], suffix_list : list[str]) -> list[tuple[str, str]]:
+    # (word, suffix) jobs, longest suffix first, in noun list order within a suffix
+    suffix_list = sorted(suffix_list)
+    suffix_list.sort(key=lambda s : -len(s))
+    suffix_order = {suffix:i for i, suffix in enumerate(suffix_list)}
+    trie = SuffixTrie(suffix_list)
+    jobs = [(n, suffix) for n in nouns for suffix in trie.matches(n)]
+    jobs.sort(key=lambda job : suffix_order[job[1]]) # stable, keeps noun order
+    return jobs
+
+def _pair_distances(noun_vecs : dict[str, np.ndarray] | WordVectorTable, words : list[str],
+                    sources : list) -> list[float | None]:
+    if isinstance(noun_vecs, WordVectorTable):
+        return [None if math.isnan(d) else d for d in noun_vecs.pair_distances(words, sources).tolist()]
+    vec_pairs = [(noun_vecs.get(w), noun_vecs.get(s)) for w, s in zip(words, sources)]
+    return [vec_distance(a, b) if a is not None and b is not None else None for a, b in vec_pairs]
+
+def sweep_suffixes(nouns : list[str], suffix_list : list[str], noun_vecs : dict[str, np.ndarray] | WordVectorTable,
+                   model_list : list[dict], processes : int = None, chunksize : int = 64) -> list[tuple]:
+    # Source guesses for every (word, suffix) job are computed independently in a process pool; the vector
+    # distances of all (word, source) pairs are then scored in one batch, and each model is applied once
+    # to the rows it is the first usable model for.
+    # The words_done dedup is applied in job order: once a word is classified as a derivative under a
+    # suffix, it is skipped for all following (shorter) suffixes, exactly as in the serial loop.
+    jobs = find_candidates(nouns, suffix_list)
+    unique_jobs = list(dict.fromkeys(jobs))
+    if processes == 1:
+        _init_worker(nouns)
+        guesses = [_guess_in_worker(job) for job in unique_jobs]
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(nouns,)) as pool:
+            guesses = list(pool.imap(_guess_in_worker, unique_jobs, chunksize))
+    vec_dists = _pair_distances(noun_vecs, [job[0] for job in unique_jobs], [g[0] for g in guesses])
+    features = [candidate_features(word, edit_score, vec_dist)
+                for (word, _), (_, edit_score), vec_dist in zip(unique_jobs, guesses, vec_dists)]
+    results = [(word, suffix, source) + scored for (word, suffix), (source, _), scored
+               in zip(unique_jobs, guesses, apply_models_batch(features, model_list))]
+    results = dict(zip(unique_jobs, results))
+    words_done = set()
+    rows = []
+    for job in jobs:
+        word = job[0]
+        if word in words_done:
+            continue
+        row = results[job]
+        if row[3] and row[4]: # a model was used and says derivative
+            words_done.add(word)
+        rows.append(row)
+    return rows
+
 if __name__ == "__main__":
+    store = ArtifactStore('./artifacts')
     print('Loading nouns')
-    nouns : list[str] = utils.p_load('./nouns_doom1.p')
+    nouns : list[str] = list(store.load_or_import('nouns_doom1', './nouns_doom1.p'))
     print('Loading vectors')
-    noun_vecs : dict[str, np.ndarray] = utils.p_load('./word_vectors/nouns_w2v.corola-big-clean.p')
+    noun_vecs : WordVectorTable = store.load_or_import('nouns_w2v.corola-big-clean',
+                                                       './word_vectors/nouns_w2v.corola-big-clean.p')
 
-    model_list : list[dict] = utils.p_load('./classifiers/is_derivative_models.p')
+    model_list : list[dict] = store.load_or_import('is_derivative_models', './classifiers/is_derivative_models.p')
     model_list.sort(key=lambda d : -d['score'])
 
-    suffix_list = ['uț', 'uleț', 'ior', 'ioară', 'ișor', 'ișoară', 'ușor', 'ușoară', 'ic', 'icel', 'ică', 'icică', 'ulică', 'uc', 'iță', 'uliță', 'ache', 'ușcă', 'ișcă', 'uș', 'ușă', 'uică', 'et', 'ete', 'oc']
-    suffix_list.sort()
-    suffix_list.sort(key=lambda s : -len(s))
+    suffix_list = load_suffixes('./data/diminutive_suffixes.csv')
 
-    words_done = []
-
-    for suffix in suffix_list:
-        candidates = [n for n in nouns if n.endswith(suffix) and len(n) > len(suffix)]
-        for word in candidates:
-            if word in words_done:
-                continue
-            guesses = guess_source_by_edit_dist(word, suffix, nouns)
-            source, edit_score = guesses[0] if guesses else (0, len(word))
-            word_len = len(word)
-            ln_word_len = math.log(word_len)
-            word_vec = noun_vecs.get(word)
-            source_vec = noun_vecs.get(source)
-            vec_dist = vec_distance(word_vec, source_vec) if word_vec is not None and source_vec is not None else None
-            data_dict = {'edit_score':edit_score, 'word_len':word_len, 'ln_word_len':ln_word_len,
-                         'vec_dist':vec_dist}
-            model_used = ''
-            is_derivative = 'n/a'
-            probability = -1
-            for model_dict in model_list:
-                if all([data_dict[arg] is not None for arg in model_dict['args']]):
-                    model = model_dict['model']
-                    data = [data_dict[arg] for arg in model_dict['args']]
-                    is_derivative = model.predict([data])[0]
-                    if is_derivative:
-                        words_done.append(word)
-                    probability = model.predict_proba([data])[0][1]
-                    model_used = ', '.join(model_dict['args'])
-                    break
-
-            print('\t'.join([word, suffix, source, model_used, str(is_derivative), f'{probability:.3f}']))
+    for word, suffix, source, model_used, is_derivative, probability in \
+            sweep_suffixes(nouns, suffix_list, noun_vecs, model_list):
+        print('\t'.join([word, suffix, source, model_used, str(is_derivative), f'{probability:.3f}']))
 
 
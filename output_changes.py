@@ -1,15 +1,15 @@
 import re
 from typing import Callable
 
-import pandas as pd
-
 import ro_phon
+import utils
 from word import Word
-from word_transformation import WordTransformation, ChangeSequence, Transition, assign_indices
+from word_transformation import WordTransformation, ChangeSequence, Transition, CostModel, assign_indices, BOS, EOS
 
 vowels = list(ro_phon.vowels)
 semivowels = list(ro_phon.glide_dict.values())
 vocalic = vowels + semivowels
+consonants = ['b', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v', 'z', 'č', 'ǧ', 'ș', 'ț']
 def cost_fn(d_in: str, d_out: str) -> float:
 
     if d_in == '+' and d_out != '':  # plus can only be deleted
@@ -65,10 +65,15 @@ def truncate_afix(word : Word, affix_list : list[str], sorted : bool = False) ->
             return Word(word[:-affix_len]), affix
     return word, ''
 
+def compile_cost_model() -> CostModel:
+    # cost_fn over the phoneme inventory
+    return CostModel(cost_fn, vocalic + consonants + ['-', '+', BOS, EOS])
+
 if __name__ == "__main__":
-    data_df = pd.read_excel('./data/DexDiminutivesSyllabic.xlsx')
+    data_df = utils.load_table('./data/DexDiminutivesSyllabic.xlsx')
     dim_pairs = data_df.to_dict(orient='records')
     dim_changes = []
+    cost_model = compile_cost_model()
     for d in dim_pairs:
         dim = d['diminutiv silabe']
         src = d['sursa silabe']
@@ -79,8 +84,8 @@ if __name__ == "__main__":
 
         dim_sylls = ro_phon.orthosyll_to_phon_word(dim, vocalic)
         src_sylls = ro_phon.orthosyll_to_phon_word(src, vocalic)
-        dim_word = Word.from_string(dim_sylls, vocalic, set(ro_phon.glide_dict.values()))
-        src_word = Word.from_string(src_sylls, vocalic, set(ro_phon.glide_dict.values()))
+        dim_word = Word.from_string(dim_sylls, vocalic, ro_phon.glide_tokenizer)
+        src_word = Word.from_string(src_sylls, vocalic, ro_phon.glide_tokenizer)
 
         dim_trunc = Word(dim_word[:-suffix_len])
         affixes = ['e', 'ă', 'u', 'u̯', 'i u̯', 'i ̯e']
@@ -88,7 +93,7 @@ if __name__ == "__main__":
         affixes.sort(key=lambda s : -len(s))
         src_trunc, dropped = truncate_afix(src_word, affixes, True)
 
-        wt = WordTransformation(src_trunc.symbol_list(), dim_trunc.symbol_list(), cost_fn)
+        wt = WordTransformation(src_trunc.symbol_list(), dim_trunc.symbol_list(), cost_model)
         changes = wt.change_sequences
         for c_seq in changes:
             assign_indices(c_seq)
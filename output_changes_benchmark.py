@@ -0,0 +1,39 @@
+import time
+
+import ro_phon
+import utils
+from word import Word
+from output_changes import cost_fn, compile_cost_model, vocalic
+from word_transformation import distance, compact_distance, find_change_sequences
+
+if __name__ == "__main__":
+    # alignment (DP) time over the DexDiminutivesSyllabic pairs
+    data_df = utils.load_table('./data/DexDiminutivesSyllabic.xlsx')
+    pairs = []
+    for d in data_df.to_dict(orient='records'):
+        src, dim = [Word.from_string(ro_phon.orthosyll_to_phon_word(w, vocalic), vocalic, ro_phon.glide_tokenizer)
+                    for w in (d['sursa silabe'], d['diminutiv silabe'])]
+        pairs.append((src.symbol_list(), dim.symbol_list()))
+
+    start = time.perf_counter()
+    cost_model = compile_cost_model()
+    print(f'{len(pairs)} pairs, cost model: {len(cost_model.symbols)} symbols, '
+          f'compiled in {time.perf_counter() - start:.3f}s')
+    # the compiled engine checked against the reference one: same alignments on every pair
+    differ = [(src, dim) for src, dim in pairs
+              if [str(c) for c in find_change_sequences(compact_distance(src, dim, cost_model))]
+              != [str(c) for c in find_change_sequences(distance(src, dim, cost_fn))]]
+    print(f'compact_distance with the CostModel vs distance with cost_fn: {len(differ)} pairs differ')
+    if differ:
+        raise Exception(f'Compiled cost model gives different alignments: {differ[:5]}')
+    timings = {}
+    for label, fn, costs in (('distance, cost_fn', distance, cost_fn),
+                             ('compact_distance, cost_fn', compact_distance, cost_fn),
+                             ('compact_distance, CostModel', compact_distance, cost_model)):
+        start = time.perf_counter()
+        for src, dim in pairs:
+            fn(src, dim, costs)
+        timings[label] = time.perf_counter() - start
+        print(f'{label}: {timings[label]:.3f}s')
+    baseline = timings['distance, cost_fn']
+    print(f'speedup over distance: {baseline / timings["compact_distance, CostModel"]:.1f}x')
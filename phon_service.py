@@ -0,0 +1,211 @@
+import abc
+import http.client
+import http.server
+import json
+import re
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+import ro_phon
+import utils
+
+TEPROLIN_URL = 'http://relate.racai.ro:5000/process'
+PHON_EXEC = 'word-phonetic-transcription'
+LEXICON_FILE = './data/Nons_Phon_Syll3.xlsx'
+
+class PhonBackend(abc.ABC):
+    # Transcribes a batch of words into teprolin-style token dicts ('_wordform', '_syll', '_phon'),
+    # None for words it cannot transcribe.
+    name = 'none'
+
+    @abc.abstractmethod
+    def transcribe(self, words : list[str]) -> list[dict | None]:
+        ...
+
+class RuleBackend(PhonBackend):
+    # Offline backend: syllabification (with stress) comes from a lexicon table or is given in the input
+    # ("ca-'ras", 'ca-"ras'), the phonetic form from the ro_phon rules. Symbols are ro_phon's (č, ǧ, i̯ ...),
+    # not teprolin's.
+    name = 'ro_phon'
+
+    def __init__(self, syllabified : dict[str, str] = None, center_chars = tuple(ro_phon.vocalic)):
+        self.syllabified = syllabified or {}
+        self.center_chars = center_chars
+
+    @staticmethod
+    def from_table(filename : str = LEXICON_FILE, word_column : str = 'Forma',
+                   syll_column : str = 'Silabic 3') -> 'RuleBackend':
+        df = utils.load_table(filename).dropna(subset=[word_column, syll_column])
+        syllabified = {}
+        for word, syll in zip(df[word_column].tolist(), df[syll_column].tolist()):
+            syllabified.setdefault(word, syll) # first entry wins
+        return RuleBackend(syllabified)
+
+    def syllabify(self, word : str) -> str | None:
+        if '-' in word or '"' in word or "'" in word:
+            return word.replace("'", '"')
+        return self.syllabified.get(word) or self.syllabified.get(word.lower())
+
+    def transcribe(self, words : list[str]) -> list[dict | None]:
+        sylls = [self.syllabify(w) for w in words]
+        phons = dict(ro_phon.batch_orthosyll_to_phon(list(dict.fromkeys([s for s in sylls if s])),
+                                                     self.center_chars, skip_errors=True))
+        tokens = []
+        for word, syll in zip(words, sylls):
+            phon = phons.get(syll) if syll else None
+            if phon is None:
+                tokens.append(None)
+                continue
+            symbols = ro_phon.glide_tokenizer(phon.replace('-', '').replace('"', ''))
+            tokens.append({'_wordform':word.replace('-', '').replace('"', '').replace("'", ''),
+                           '_syll':syll.replace('"', "'"), '_phon':' '.join(symbols)})
+        return tokens
+
+class TeprolinClient(PhonBackend):
+    # Client for the teprolin /process protocol. Many words are sent per request (space separated), over
+    # one kept-alive connection; tokens are matched back to the words in order.
+    name = 'teprolin'
+
+    def __init__(self, url : str = TEPROLIN_URL, batch_size : int = 200, timeout : float = 60):
+        parsed = urllib.parse.urlsplit(url)
+        self.host, self.port, self.path = parsed.hostname, parsed.port or 80, parsed.path or '/'
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.connection : http.client.HTTPConnection = None
+        self.request_count = 0
+
+    def _post(self, text : str) -> dict:
+        body = urllib.parse.urlencode({'text':text, 'exec':PHON_EXEC}).encode('utf-8') # bytes: one send with the headers
+        headers = {'Content-Type':'application/x-www-form-urlencoded', 'Connection':'keep-alive'}
+        for attempt in (0, 1): # the server may have closed an idle connection
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request('POST', self.path, body, headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise Exception(f'teprolin returned {response.status}: {data[:200]}')
+        self.request_count += 1
+        return json.loads(data.decode('utf-8'))
+
+    def transcribe(self, words : list[str]) -> list[dict | None]:
+        tokens = []
+        for start in range(0, len(words), self.batch_size):
+            batch = words[start:start + self.batch_size]
+            result = self._post(' '.join(batch))['teprolin-result']['tokenized']
+            batch_tokens = [t for sentence in result for t in sentence]
+            if [t['_wordform'] for t in batch_tokens] == batch:
+                tokens.extend(batch_tokens)
+            else: # the server tokenized differently, match by wordform
+                by_form = {}
+                for t in batch_tokens:
+                    by_form.setdefault(t['_wordform'], t)
+                tokens.extend([by_form.get(w) for w in batch])
+        return tokens
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class CachedTranscriber:
+    # LRU results cache in front of a backend; only words not seen before are sent, once each
+    def __init__(self, backend : PhonBackend, max_size : int = 100000):
+        self.backend = backend
+        self.max_size = max_size
+        self.cache : OrderedDict[str, dict | None] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def transcribe(self, words : list[str]) -> list[dict | None]:
+        # a word repeated within the batch is sent once, but it is not a hit unless it was already cached
+        self.hits += sum([1 for w in words if w in self.cache])
+        missing = [w for w in dict.fromkeys(words) if w not in self.cache]
+        self.misses += len(missing)
+        found = dict(zip(missing, self.backend.transcribe(missing))) if missing else {}
+        tokens = []
+        for w in words:
+            if w in found:
+                token = found[w]
+            else:
+                token = self.cache[w]
+                self.cache.move_to_end(w)
+            tokens.append(token)
+        for w, token in found.items():
+            self.cache[w] = token
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return tokens
+
+    def cache_info(self) -> dict:
+        return {'hits':self.hits, 'misses':self.misses, 'size':len(self.cache), 'max_size':self.max_size}
+
+class _TeprolinHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive, so clients can reuse the connection
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        if self.path != '/process':
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        form = urllib.parse.parse_qs(body)
+        text = form.get('text', [''])[0]
+        words = re.findall(r'\w+', text)
+        tokens = self.server.backend.transcribe(words)
+        tokenized = [[(t or {'_wordform':w, '_syll':'', '_phon':''}) | {'_id':i+1}
+                      for i, (w, t) in enumerate(zip(words, tokens))]]
+        data = json.dumps({'teprolin-conf':{PHON_EXEC:self.server.backend.name},
+                           'teprolin-result':{'text':text, 'sentences':[text], 'tokenized':tokenized}},
+                          ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class TeprolinStubServer:
+    # local stand-in for the teprolin /process endpoint, answering word-phonetic-transcription requests
+    # from a backend; port 0 picks a free port
+    def __init__(self, backend : PhonBackend, host : str = '127.0.0.1', port : int = 0):
+        self.server = http.server.ThreadingHTTPServer((host, port), _TeprolinHandler)
+        self.server.daemon_threads = True
+        self.server.backend = backend
+        self.thread : threading.Thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/process'
+
+    def start(self) -> 'TeprolinStubServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+if __name__ == "__main__":
+    # serve the rule-based backend on the teprolin protocol: python phon_service.py [port]
+    import sys
+    server = TeprolinStubServer(RuleBackend.from_table(), port=int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    print(f'Serving on {server.url}')
+    server.server.serve_forever()
@@ -0,0 +1,43 @@
+import time
+
+import utils
+from phon_service import RuleBackend, TeprolinClient, CachedTranscriber, TeprolinStubServer
+
+if __name__ == "__main__":
+    # throughput against a local stand-in for the teprolin service
+    backend = RuleBackend.from_table()
+    df = utils.load_table('./data/DexDiminutivesSyllabic.xlsx')
+    words = [w for w in df['diminutiv'].dropna().tolist() + df['sursa'].dropna().tolist()]
+    print(f'{len(words)} words, {len(set(words))} distinct')
+
+    start = time.perf_counter()
+    tokens = backend.transcribe(words)
+    elapsed = time.perf_counter() - start
+    print(f'rule backend, direct: {len(words) / elapsed:.0f} words/s, {sum([t is not None for t in tokens])} transcribed')
+
+    with TeprolinStubServer(backend) as server:
+        sample = words[:300]
+        start = time.perf_counter()
+        for w in sample: # like get_phon_syll: one request and one connection per word
+            client = TeprolinClient(server.url, batch_size=1)
+            client.transcribe([w])
+            client.close()
+        elapsed = time.perf_counter() - start
+        print(f'one word per request: {len(sample) / elapsed:.0f} words/s')
+
+        for batch_size in (50, 500):
+            client = TeprolinClient(server.url, batch_size=batch_size)
+            start = time.perf_counter()
+            client.transcribe(words)
+            elapsed = time.perf_counter() - start
+            print(f'batch_size={batch_size}, reused connection: {len(words) / elapsed:.0f} words/s '
+                  f'({client.request_count} requests)')
+            client.close()
+
+        cached = CachedTranscriber(TeprolinClient(server.url))
+        for run in ('cold', 'warm'):
+            start = time.perf_counter()
+            cached.transcribe(words)
+            elapsed = time.perf_counter() - start
+            print(f'cached ({run}): {len(words) / elapsed:.0f} words/s')
+        print(cached.cache_info())
@@ -1,6 +1,8 @@
-from word import Syllable
+from word import Syllable, Tokenizer, center_regex
 
+import functools
 import re
+from typing import Iterable, Iterator
 
 vowels = ('a', 'e', 'i', 'o', 'u', 'ă', 'î')
 
@@ -13,6 +15,8 @@ glide_dict = {
 
 vocalic = list(vowels) + list(glide_dict.values())
 
+glide_tokenizer = Tokenizer(glide_dict.values())
+
 N_phthongs =\
     {'ai': ['ai̯'], 'au': ['au̯'], 'ei': ['ei̯'], 'eu': ['eu̯'], 'ii': ['ii̯'], 'iu': ['iu̯', 'i̯u'], 'oi': ['oi̯'],
      'ou': ['ou̯'], 'ui': ['ui̯'], 'ăi': ['ăi̯'], 'ău': ['ău̯'], 'îi': ['îi̯'], 'îu': ['îu̯'], 'ea': ['e̯a'],
@@ -21,16 +25,20 @@ N_phthongs =\
      'iou': ['i̯ou̯'], 'uai': ['u̯ai̯'], 'uau': ['u̯au̯'], 'uăi': ['u̯ăi̯'], 'oai': ['o̯ai̯'], 'eoa': ['e̯o̯a'],
      'ioa': ['i̯o̯a'], 'ioai': ['i̯o̯ai̯'], 'ioi': ['i̯oi̯']}
 
+_soft_c = re.compile(r'c([ei])')
+_soft_g = re.compile(r'g([ei])')
+_hard_c = re.compile(r'ch?')
+
 def orthosyll_to_phon_syllable(syl : str, center_chars : set[str],
                                is_final : bool, is_stressed : bool, is_unique : bool) -> str:
     if 'â' in syl:
         syl = syl.replace('â', 'î')
     if 'c' in syl or 'g' in syl:
-        syl = re.sub(r'c([ei])', r'č\1', syl)
-        syl = re.sub(r'g([ei])', r'ǧ\1', syl)
-        syl = re.sub(r'ch?', 'k', syl)
+        syl = _soft_c.sub(r'č\1', syl)
+        syl = _soft_g.sub(r'ǧ\1', syl)
+        syl = _hard_c.sub('k', syl)
         syl = syl.replace('gh', 'g')
-    m = re.search(rf'[{"".join(center_chars)}]+', syl)
+    m = center_regex(center_chars).search(syl)
     if not m:
         raise Exception(f"Syllable {syl} has no center.")
     center = syl[m.start():m.end()]
@@ -64,11 +72,36 @@ def orthosyll_to_phon_word(word : str, center_chars : set[str], syll_sep_tok = '
         syl_list.append(orthosyll_to_phon_syllable(syl_src, center_chars, is_final, is_stressed, is_unique))
     return syll_sep_tok.join(syl_list)
 
+@functools.lru_cache(maxsize=None)
+def _cached_phon_syllable(syl : str, center_key : str, is_final : bool, is_stressed : bool, is_unique : bool) -> str:
+    # center_key is the joined center_chars, which builds the same character class
+    return orthosyll_to_phon_syllable(syl, center_key, is_final, is_stressed, is_unique)
+
+def batch_orthosyll_to_phon(words : Iterable[str], center_chars : set[str], syll_sep_tok = '-',
+                            syll_stress_tok = '"', skip_errors : bool = False) -> Iterator[tuple[str, str | None]]:
+    # streams (ortho, phon) pairs; syllable conversions are memoized, since the inventory is small and repetitive.
+    # With skip_errors, words that cannot be converted come out as (ortho, None) instead of raising.
+    center_key = "".join(center_chars)
+    for word in words:
+        sylls = word.split(syll_sep_tok)
+        try:
+            phon = syll_sep_tok.join([_cached_phon_syllable(syl_src, center_key, i == len(sylls)-1,
+                                                            syll_stress_tok in syl_src, len(sylls) == 1)
+                                      for i, syl_src in enumerate(sylls)])
+        except Exception:
+            if not skip_errors:
+                raise
+            phon = None
+        yield word, phon
+
+def phon_cache_info() -> tuple:
+    return _cached_phon_syllable.cache_info()
+
 
 if __name__ == "__main__":
-    import pandas as pd
+    import utils
 
-    data_df = pd.read_excel('./data/DexDiminutivesSyllabic.xlsx')
+    data_df = utils.load_table('./data/DexDiminutivesSyllabic.xlsx')
     dim_pairs = data_df.to_dict(orient='records')
 
     for d in dim_pairs:
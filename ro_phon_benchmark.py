@@ -0,0 +1,33 @@
+import time
+
+import pandas as pd
+
+import ro_phon
+
+def per_word(words : list[str], center_chars) -> list[tuple[str, str | None]]:
+    pairs = []
+    for word in words:
+        try:
+            pairs.append((word, ro_phon.orthosyll_to_phon_word(word, center_chars)))
+        except Exception:
+            pairs.append((word, None))
+    return pairs
+
+if __name__ == "__main__":
+    dex_df = pd.read_excel('./data/DexDiminutivesSyllabic.xlsx')
+    nons_df = pd.read_excel('./data/Nons_Phon_Syll3.xlsx').fillna('')
+    inputs = [('DexDiminutivesSyllabic', dex_df['diminutiv silabe'].to_list() + dex_df['sursa silabe'].to_list()),
+              ('Nons_Phon_Syll3', [w for w in nons_df['Silabic 3'].to_list() if w])]
+    for name, words in inputs:
+        start = time.perf_counter()
+        expected = per_word(words, ro_phon.vocalic)
+        per_word_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        pairs = list(ro_phon.batch_orthosyll_to_phon(words, ro_phon.vocalic, skip_errors=True))
+        batch_seconds = time.perf_counter() - start
+        if pairs != expected:
+            raise Exception(f'Batch output differs from orthosyll_to_phon_word on {name}!')
+        print(f'{name}: {len(words)} words, {sum([p is None for _, p in pairs])} errors')
+        print(f'\tper word\t{len(words) / per_word_seconds:.0f} words/s')
+        print(f'\tbatch\t{len(words) / batch_seconds:.0f} words/s')
+    print(ro_phon.phon_cache_info())
@@ -1,17 +1,214 @@
 
 import dataclasses
+import math
+
+import numpy as np
+
+OVER_THRESHOLD = math.inf # returned instead of a score when the distance exceeds max_cost
+
+CHEAP_INDEL = 0.1 # inserting/deleting the a of oa, ea
+BOUND_SLACK = 1e-9 # lower bounds are summed in a different order than the DP, allow for rounding
+
+def cheap_positions(s : str) -> int:
+    # positions where inserting/deleting costs CHEAP_INDEL instead of 1 (the a of oa, ea)
+    return sum([1 for i in range(1, len(s)) if s[i] == 'a' and s[i-1] in ('o', 'e')])
+
+def indel_cost_bound(count : int, cheap_count : int) -> float:
+    # lowest possible cost of count insertions (or deletions), cheap_count of which may be cheap
+    return CHEAP_INDEL * min(count, cheap_count) + max(0, count - cheap_count)
+
+def _band(m : int, n : int, cheap_s : int, cheap_t : int, max_cost : float) -> tuple[int, int]:
+    # range of diagonals k = j - i that a path costing at most max_cost can visit: reaching cell (i, j) and
+    # going on to (m, n) takes at least the deletions and insertions counted below. The bound is convex in k,
+    # so the allowed diagonals form an interval (empty if lo > hi).
+    allowed = [k for k in range(-m, n + 1)
+               if indel_cost_bound(max(0, -k) + max(0, k - (n - m)), cheap_s)
+               + indel_cost_bound(max(0, k) + max(0, (n - m) - k), cheap_t) <= max_cost + BOUND_SLACK]
+    return (allowed[0], allowed[-1]) if allowed else (1, 0)
+
+def _cheap_classes(sub_cost_dict : dict[tuple[str, str], float]) -> dict[str, str]:
+    # characters joined by substitutions cheaper than 1 (and a/e, for ia -> ie), mapped to one representative
+    parent = {}
+    def find(c : str) -> str:
+        while parent.get(c, c) != c:
+            c = parent[c]
+        return c
+    for a, b in [pair for pair, cost in sub_cost_dict.items() if cost < 1] + [('a', 'e')]:
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    return {c:find(c) for c in parent}
+
+def _pattern_masks(s : str) -> dict[str, int]:
+    peq = {}
+    for i, c in enumerate(s):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    return peq
+
+def unit_edit_distance(s : str, t : str) -> int:
+    # Levenshtein distance, bit-parallel (Myers, in Hyyrö's formulation): one bit per character of s in
+    # Python ints, so s can be of any length
+    m = len(s)
+    if m == 0:
+        return len(t)
+    peq = _pattern_masks(s)
+    mask, high = (1 << m) - 1, 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for c in t:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score
+
+def _batch_unit_edit_distance(s : str, t_ids : np.ndarray, lengths : np.ndarray, char_ids : dict[str, int]) \
+        -> np.ndarray:
+    # unit_edit_distance(s, t) for every padded row of t_ids, 64 bit lanes in numpy (len(s) <= 64)
+    m = len(s)
+    if m == 0:
+        return lengths.copy()
+    peq = np.zeros(len(char_ids) + 1, dtype=np.uint64) # the last id is padding, it matches nothing
+    for c, bits in _pattern_masks(s).items():
+        if c in char_ids:
+            peq[char_ids[c]] = bits
+    mask, high = np.uint64((1 << m) - 1), np.uint64(1 << (m - 1))
+    one, zero = np.uint64(1), np.uint64(0)
+    pv = np.full(len(t_ids), mask)
+    mv = np.zeros(len(t_ids), dtype=np.uint64)
+    score = np.full(len(t_ids), m, dtype=np.int64)
+    for j in range(t_ids.shape[1]):
+        eq = peq[t_ids[:, j]]
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        active = j < lengths
+        score += (active & ((ph & high) != zero)).astype(np.int64)
+        score -= (active & ((ph & high) == zero) & ((mh & high) != zero)).astype(np.int64)
+        ph = (ph << one) | one
+        mh = mh << one
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score
+
+def _ops_cost_bound(ops : np.ndarray, cheap_count : np.ndarray) -> np.ndarray:
+    # lowest cost of ops insertions, deletions and substitutions between classes, cheap_count of which may be
+    # cheap insertions/deletions
+    return CHEAP_INDEL * np.minimum(ops, cheap_count) + np.maximum(0, ops - cheap_count)
+
+class CandidateBounds:
+    # lower bounds on simple_string_distance(s, t, sub_cost_dict) for a fixed list of candidates t, encoded
+    # once so that many strings s can be bounded against them. The bounds come from
+    # - the length difference, which needs that many insertions or deletions,
+    # - the histograms of the strings with cheaply substituted characters merged: every unmatched character
+    #   needs an insertion, deletion or full cost substitution,
+    # - the unit edit distance between those merged strings, which counts the same operations more tightly,
+    # - the unit edit distance of the strings themselves, times the lowest cost of any operation.
+    # The edit distances (bit-parallel) are only computed for candidates still under max_cost.
+    def __init__(self, candidates : list[str], sub_cost_dict : dict[tuple[str, str], float] = None):
+        if sub_cost_dict is None:
+            sub_cost_dict = {}
+        self.candidates = candidates
+        self.classes = _cheap_classes(sub_cost_dict)
+        self.min_cost = min([CHEAP_INDEL, 0.1, 1] + list(sub_cost_dict.values())) # 0.1: ia -> ie
+        self.lengths = np.array([len(t) for t in candidates], dtype=np.int64)
+        # all characters at once: ids from np.unique, scattered into a padded (candidates, max length) matrix
+        alphabet, flat_ids = np.unique(np.array(list(''.join(candidates)), dtype='<U1'), return_inverse=True)
+        alphabet = alphabet.tolist()
+        self.char_ids = {c:i for i, c in enumerate(alphabet)}
+        self.t_ids = np.full((len(candidates), int(self.lengths.max(initial=0))), len(alphabet), dtype=np.intp)
+        starts = np.cumsum(self.lengths) - self.lengths
+        rows = np.repeat(np.arange(len(candidates)), self.lengths)
+        self.t_ids[rows, np.arange(len(flat_ids)) - np.repeat(starts, self.lengths)] = flat_ids
+        merged_alphabet = sorted(set([self.classes.get(c, c) for c in alphabet]))
+        self.merged_ids = {c:i for i, c in enumerate(merged_alphabet)}
+        to_merged = np.array([self.merged_ids[self.classes.get(c, c)] for c in alphabet] + [len(merged_alphabet)])
+        self.merged_t_ids = to_merged[self.t_ids]
+        a_id, oe_ids = self.char_ids.get('a', -1), [self.char_ids.get(c, -1) for c in ('o', 'e')]
+        self.cheap_counts = ((self.t_ids[:, 1:] == a_id) & np.isin(self.t_ids[:, :-1], oe_ids)).sum(axis=1)
+        n_ids = len(merged_alphabet) + 1
+        self.counts = np.bincount((np.arange(len(candidates))[:, None] * n_ids + self.merged_t_ids).ravel(),
+                                  minlength=len(candidates) * n_ids).reshape(len(candidates), n_ids)[:, :-1]
+
+    def _merge(self, s : str) -> str:
+        return ''.join([self.classes.get(c, c) for c in s])
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def lower_bounds(self, s : str, max_cost : float = None, rows : np.ndarray = None) -> np.ndarray:
+        # bounds for the candidates at rows (default all)
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.intp)
+        lengths, cheap_t = self.lengths[rows], self.cheap_counts[rows]
+        cheap_s = cheap_positions(s)
+        deletions, insertions = np.maximum(0, len(s) - lengths), np.maximum(0, lengths - len(s))
+        bounds = _ops_cost_bound(deletions, cheap_s) + _ops_cost_bound(insertions, cheap_t)
+        s_merged = self._merge(s)
+        # characters no candidate has are always unmatched
+        s_counts = np.bincount([self.merged_ids[c] for c in s_merged if c in self.merged_ids],
+                               minlength=len(self.merged_ids))
+        unknown = len(s_merged) - int(s_counts.sum())
+        counts = self.counts[rows]
+        unmatched = np.maximum(np.maximum(counts - s_counts, 0).sum(axis=1),
+                               np.maximum(s_counts - counts, 0).sum(axis=1) + unknown)
+        bounds = np.maximum(bounds, _ops_cost_bound(unmatched, cheap_s + cheap_t))
+        todo = np.arange(len(rows)) if max_cost is None else np.flatnonzero(bounds <= max_cost + BOUND_SLACK)
+        if not len(todo):
+            return bounds
+        rows, cheap_t = rows[todo], cheap_t[todo]
+        dists = self._unit_distances(s_merged, self.merged_t_ids, self.merged_ids, rows, merged=True)
+        bounds[todo] = np.maximum(bounds[todo], _ops_cost_bound(dists, cheap_s + cheap_t))
+        if self.min_cost > 0:
+            dists = self._unit_distances(s, self.t_ids, self.char_ids, rows)
+            bounds[todo] = np.maximum(bounds[todo], self.min_cost * dists)
+        return bounds
+
+    def _unit_distances(self, s : str, t_ids : np.ndarray, char_ids : dict[str, int], rows : np.ndarray,
+                        merged : bool = False) -> np.ndarray:
+        if len(s) <= 64:
+            return _batch_unit_edit_distance(s, t_ids[rows], self.lengths[rows], char_ids)
+        strings = [self._merge(self.candidates[r]) if merged else self.candidates[r] for r in rows]
+        return np.array([unit_edit_distance(s, t) for t in strings], dtype=np.int64)
+
+def edit_lower_bounds(s : str, candidates : list[str], sub_cost_dict : dict[tuple[str, str], float] = None,
+                      max_cost : float = None) -> np.ndarray:
+    # see CandidateBounds
+    if not candidates:
+        return np.zeros(0)
+    return CandidateBounds(candidates, sub_cost_dict).lower_bounds(s, max_cost)
 
 def simple_string_distance(s : str, t : str,
-                           sub_cost_dict : dict[tuple[str, str], float] = None) -> int:
+                           sub_cost_dict : dict[tuple[str, str], float] = None, max_cost : float = None) -> int:
+    # with max_cost, only the diagonal band that can stay under max_cost is filled, and OVER_THRESHOLD is
+    # returned as soon as a whole row exceeds it (or if the distance does)
     if sub_cost_dict is None:
         sub_cost_dict = {}
     m = len(s)
     n = len(t)
-    v0 = list(range(n+1))
+    if max_cost is None:
+        k_lo, k_hi = -m, n
+    else:
+        k_lo, k_hi = _band(m, n, cheap_positions(s), cheap_positions(t), max_cost)
+        if k_lo > k_hi:
+            return OVER_THRESHOLD
+    v0 = [j if j <= k_hi else OVER_THRESHOLD for j in range(n+1)]
     v1 = [0]*(n+1)
     for i in range(m):
-        v1[0] = i + 1
-        for j in range(n):
+        j_start, j_stop = max(0, i + 1 + k_lo), min(n, i + 1 + k_hi) # band columns of row i + 1
+        if max_cost is not None:
+            v1 = [OVER_THRESHOLD]*(n+1)
+        if j_start == 0:
+            v1[0] = i + 1
+        for j in range(max(0, j_start - 1), j_stop):
             # // calculating costs for A[i + 1][j + 1]
             # low cost for oa -> o, ea -> o, ia -> ie
             deletionPenalty = 1
@@ -33,5 +230,83 @@ def simple_string_distance(s : str, t : str,
                 substitutionPenalty = 1
             substitutionCost = v0[j] + substitutionPenalty #v0[j] if s[i] == t[j] else v0[j]+1
             v1[j + 1] = min(deletionCost, insertionCost, substitutionCost)
+        if max_cost is not None and min(v1[j_start:j_stop + 1]) > max_cost:
+            return OVER_THRESHOLD
         v0, v1 = v1, v0 # swap
+    if max_cost is not None and v0[n] > max_cost:
+        return OVER_THRESHOLD
     return v0[n]
+
+def _sub_cost_matrix(alphabet : list[str], sub_cost_dict : dict[tuple[str, str], float]) -> np.ndarray:
+    sub_matrix = np.ones((len(alphabet), len(alphabet)))
+    for a_i, a in enumerate(alphabet):
+        for b_i, b in enumerate(alphabet):
+            if a == b:
+                sub_matrix[a_i, b_i] = 0
+            elif (a, b) in sub_cost_dict:
+                sub_matrix[a_i, b_i] = sub_cost_dict[(a, b)]
+    return sub_matrix
+
+def batch_string_distance(s : str, candidates : list[str],
+                          sub_cost_dict : dict[tuple[str, str], float] = None, max_cost : float = None) -> np.ndarray:
+    # simple_string_distance(s, t, sub_cost_dict) for every t in candidates, one DP row at a time for all of them.
+    # With max_cost, candidates that cannot stay under it (by length, or once a whole row exceeds it) are
+    # dropped from the computation and come out as OVER_THRESHOLD.
+    if sub_cost_dict is None:
+        sub_cost_dict = {}
+    if not candidates:
+        return np.zeros(0)
+    alphabet = sorted(set(s).union(*candidates))
+    char_ids = {c:i for i, c in enumerate(alphabet)}
+    sub_matrix = _sub_cost_matrix(alphabet, sub_cost_dict)
+    lengths = np.array([len(t) for t in candidates])
+    n = int(lengths.max())
+    t_ids = np.zeros((len(candidates), n), dtype=np.intp) # padding never reaches the columns we read
+    for c_i, t in enumerate(candidates):
+        t_ids[c_i, :len(t)] = [char_ids[c] for c in t]
+    t_chars = np.array(alphabet)[t_ids]
+    # low cost for inserting the a of oa/ea
+    insertion_penalties = np.ones((len(candidates), n))
+    cheap_insertions = (t_chars[:, 1:] == 'a') & np.isin(t_chars[:, :-1], ('o', 'e'))
+    insertion_penalties[:, 1:][cheap_insertions] = 0.1
+
+    result = np.full(len(candidates), OVER_THRESHOLD)
+    alive = np.arange(len(candidates))
+    if max_cost is not None:
+        # the length difference alone needs this many insertions or deletions
+        cheap_t = (cheap_insertions & (np.arange(1, n)[None, :] < lengths[:, None])).sum(axis=1)
+        deletions, insertions = np.maximum(0, len(s) - lengths), np.maximum(0, lengths - len(s))
+        cheap_s = cheap_positions(s)
+        bounds = (CHEAP_INDEL * np.minimum(deletions, cheap_s) + np.maximum(0, deletions - cheap_s)
+                  + CHEAP_INDEL * np.minimum(insertions, cheap_t) + np.maximum(0, insertions - cheap_t))
+        alive = np.flatnonzero(bounds <= max_cost + BOUND_SLACK)
+        t_ids, insertion_penalties, lengths = t_ids[alive], insertion_penalties[alive], lengths[alive]
+        padding = np.arange(n + 1)[None, :] > lengths[:, None]
+    v0 = np.tile(np.arange(n + 1, dtype=float), (len(alive), 1))
+    v1 = np.zeros_like(v0)
+    for i in range(len(s)):
+        if not len(alive):
+            return result
+        deletion_penalty = 0.1 if s[i] == 'a' and i > 0 and s[i-1] in ('o', 'e') else 1
+        sub_row = sub_matrix[char_ids[s[i]]]
+        if s[i] == 'a' and i > 0 and s[i-1] == 'i' and 'e' in char_ids and ('a', 'e') not in sub_cost_dict: # ia->ie
+            sub_row = sub_row.copy()
+            sub_row[char_ids['e']] = 0.1
+        substitution_penalties = sub_row[t_ids]
+        # deletion and substitution only depend on the previous row
+        del_sub_costs = np.minimum(v0[:, 1:] + deletion_penalty, v0[:, :-1] + substitution_penalties)
+        v1[:, 0] = i + 1
+        for j in range(n):
+            v1[:, j + 1] = np.minimum(del_sub_costs[:, j], v1[:, j] + insertion_penalties[:, j])
+        v0, v1 = v1, v0 # swap
+        if max_cost is not None: # drop candidates whose whole row is over max_cost
+            keep = np.where(padding, OVER_THRESHOLD, v0).min(axis=1) <= max_cost
+            if not keep.all():
+                alive, v0, v1 = alive[keep], v0[keep], v1[keep]
+                t_ids, insertion_penalties = t_ids[keep], insertion_penalties[keep]
+                lengths, padding = lengths[keep], padding[keep]
+    dists = v0[np.arange(len(alive)), lengths]
+    if max_cost is not None:
+        dists[dists > max_cost] = OVER_THRESHOLD
+    result[alive] = dists
+    return result
@@ -0,0 +1,62 @@
+import random
+import time
+
+import numpy as np
+
+from find_derivative_root import SourceIndex, guess_source_by_edit_dist, remove_final_vowels, substitution_costs
+from string_distance import batch_string_distance, unit_edit_distance, CandidateBounds
+
+SUFFIXES = ('șor', 'ică', 'iță', 'el', 'aș', 'uț')
+
+def levenshtein(s : str, t : str) -> int:
+    v0 = list(range(len(t) + 1))
+    for i, a in enumerate(s):
+        v1 = [i + 1]
+        for j, b in enumerate(t):
+            v1.append(min(v0[j + 1] + 1, v1[j] + 1, v0[j] + (a != b)))
+        v0 = v1
+    return v0[-1]
+
+def unfiltered_guess(deriative : str, suffix : str, nouns : list[str], dist_cutoff : int) -> list[tuple[str, float]]:
+    # guess_source_by_edit_dist without bounds or thresholds: the weighted DP over every candidate
+    der_root = remove_final_vowels(deriative[:-len(suffix)], 1)
+    candidates = [c for c in nouns if c[0] == deriative[0] and c != deriative]
+    dists = batch_string_distance(der_root, [remove_final_vowels(c, 1) for c in candidates], substitution_costs)
+    scores = sorted(set(dists.tolist()))[:dist_cutoff]
+    found = [(c, d) for c, d in zip(candidates, dists.tolist()) if d in scores]
+    found.sort(key=lambda t : t[-1])
+    return found
+
+if __name__ == "__main__":
+    # the lower bound prefilter must not change the ranked source candidates
+    nouns = [line.strip() for line in open('./data/subst_comune_doom.txt', encoding='utf-8') if line.strip()]
+    rng = random.Random(0)
+    alphabet = 'aăâeioustțșrlnc'
+    pairs = [(''.join(rng.choices(alphabet, k=rng.randint(0, 12))), ''.join(rng.choices(alphabet, k=rng.randint(0, 12))))
+             for _ in range(5000)] + [(rng.choice(nouns) * 5, rng.choice(nouns) * 5) for _ in range(200)]
+    mismatches = sum([unit_edit_distance(s, t) != levenshtein(s, t) for s, t in pairs])
+    print(f'unit_edit_distance: {mismatches} mismatches in {len(pairs)} pairs')
+    sample = rng.sample(nouns, 2000)
+    bounds = CandidateBounds(sample, substitution_costs)
+    violations = 0
+    for s in rng.sample(nouns, 50):
+        exact = batch_string_distance(s, sample, substitution_costs)
+        violations += int(np.sum(bounds.lower_bounds(s) > exact + 1e-9))
+    print(f'lower bounds over the weighted distance: {violations} in {50 * len(sample)}')
+
+    words = rng.sample([w for w in nouns if w.endswith(SUFFIXES)], 200)
+    queries = [(w, next(s for s in SUFFIXES if w.endswith(s)), dist_cutoff) for w in words for dist_cutoff in (1, 3)]
+    start = time.perf_counter()
+    expected = [unfiltered_guess(w, suffix, nouns, dist_cutoff) for w, suffix, dist_cutoff in queries]
+    print(f'unfiltered: {time.perf_counter() - start:.3f}s for {len(queries)} queries')
+    start = time.perf_counter()
+    found = [guess_source_by_edit_dist(w, suffix, nouns, dist_cutoff) for w, suffix, dist_cutoff in queries]
+    print(f'guess_source_by_edit_dist: {time.perf_counter() - start:.3f}s, '
+          f'{sum([a != b for a, b in zip(found, expected)])} rankings differ')
+    start = time.perf_counter()
+    source_index = SourceIndex(nouns)
+    print(f'SourceIndex built in {time.perf_counter() - start:.3f}s')
+    start = time.perf_counter()
+    found = [source_index.guess_source(w, suffix, dist_cutoff) for w, suffix, dist_cutoff in queries]
+    print(f'SourceIndex.guess_source: {time.perf_counter() - start:.3f}s, '
+          f'{sum([a != b for a, b in zip(found, expected)])} rankings differ')
@@ -0,0 +1,59 @@
+from typing import Iterable
+
+import pandas as pd
+
+_END = ''
+
+class SuffixTrie:
+    # suffixes stored as a trie over reversed strings, so that all suffixes of a word are found in one pass
+    def __init__(self, suffixes : Iterable[str] = ()):
+        self.root : dict = {}
+        for suffix in suffixes:
+            self.add(suffix)
+
+    def add(self, suffix : str):
+        if not suffix:
+            raise Exception('Empty suffix!')
+        node = self.root
+        for c in reversed(suffix):
+            node = node.setdefault(c, {})
+        node[_END] = suffix
+
+    def matches(self, word : str, proper : bool = True) -> list[str]:
+        # suffixes the word ends in, longest first; proper means the word must be longer than the suffix
+        found = []
+        node = self.root
+        for i, c in enumerate(reversed(word)):
+            node = node.get(c)
+            if node is None:
+                break
+            if _END in node and (not proper or i + 1 < len(word)):
+                found.append(node[_END])
+        return found[::-1]
+
+    def longest_match(self, word : str, proper : bool = True) -> str | None:
+        found = self.matches(word, proper)
+        return found[0] if found else None
+
+    def match_all(self, words : Iterable[str], proper : bool = True) -> dict[str, str]:
+        # longest matching suffix for every word that has one
+        matched = {}
+        for word in words:
+            if word in matched:
+                continue
+            suffix = self.longest_match(word, proper)
+            if suffix is not None:
+                matched[word] = suffix
+        return matched
+
+    def __contains__(self, suffix : str) -> bool:
+        node = self.root
+        for c in reversed(suffix):
+            node = node.get(c)
+            if node is None:
+                return False
+        return _END in node
+
+def load_suffixes(filename : str = './data/diminutive_suffixes.csv', column : str = 'Root') -> list[str]:
+    data = pd.read_csv(filename, sep='\t', encoding='utf-8')
+    return data[column].dropna().to_list()
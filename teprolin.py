@@ -5,6 +5,8 @@ import subprocess
 import requests
 import pycurl
 
+from phon_service import TeprolinClient
+
 
 
 url = 'http://relate.racai.ro:5000/process'
@@ -16,6 +18,11 @@ def get_phon_syll(text : str) -> list[dict]:
     json_res = json_res['teprolin-result']['tokenized']
     return list(itertools.chain.from_iterable(json_res))
 
+def get_phon_syll_batch(words : list[str], client : TeprolinClient = None) -> list[dict | None]:
+    # one token dict per word, many words per request over a reused connection
+    client = client or TeprolinClient(url)
+    return client.transcribe(words)
+
 
 
 
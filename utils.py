@@ -1,5 +1,13 @@
 
+import concurrent.futures
+import gzip
+import hashlib
+import itertools
 import json
+import os
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator
+
 import pandas as pd
 
 
@@ -14,16 +22,122 @@ def p_save(obj, filename : str):
         pickle.dump(obj, handle)
 
 
-def import_jsonl(filename : str) -> list[dict]:
-    with open(filename, 'r', encoding='utf-8') as handle:
-        lines = handle.readlines()
-    data = []
-    for i, line in enumerate(lines):
+def _open_text(filename : str):
+    with open(filename, 'rb') as handle:
+        is_gzip = handle.read(2) == b'\x1f\x8b'
+    if is_gzip:
+        return gzip.open(filename, 'rt', encoding='utf-8')
+    return open(filename, 'r', encoding='utf-8')
+
+def _decode_json_lines(numbered_lines : list[tuple[int, str]]) -> list[tuple[int, str, Any, str | None]]:
+    decoded = []
+    for i, line in numbered_lines:
         try:
-            data.append(json.loads(line))
+            decoded.append((i, line, json.loads(line), None))
         except Exception as e:
-            raise Exception(f'Error parsing line {i}, "{line}":{str(e)}')
-    return data
+            decoded.append((i, line, None, str(e)))
+    return decoded
+
+def _read_line_chunks(handle, chunk_lines : int) -> Iterator[list[tuple[int, str]]]:
+    numbered_lines = enumerate(handle)
+    while True:
+        chunk = list(itertools.islice(numbered_lines, chunk_lines))
+        if not chunk:
+            return
+        yield chunk
+
+def _bounded_map(pool : concurrent.futures.Executor, fn : Callable, items : Iterator,
+                 max_pending : int) -> Iterator:
+    # like pool.map, in order, but never reads more than max_pending items ahead
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _check_decoded(decoded_chunks : Iterable[list[tuple[int, str, Any, str | None]]], errors : str) -> Iterator[Any]:
+    for chunk in decoded_chunks:
+        for i, line, obj, error in chunk:
+            if error is None:
+                yield obj
+            elif errors == 'raise':
+                raise Exception(f'Error parsing line {i}, "{line}":{error}')
+            elif errors == 'warn':
+                print(f'Error parsing line {i}, "{line.strip()}":{error}')
+
+def iter_jsonl(filename : str, errors : str = 'raise', processes : int = None,
+               chunk_lines : int = 1000) -> Iterator[Any]:
+    # Streams the objects of a (possibly gzipped) jsonl file in file order, holding only a few chunks of
+    # lines in memory. With processes > 1, chunks are decoded in a process pool. errors is 'raise' (stop
+    # at the first bad line), 'warn' (print the line number and go on) or 'ignore'.
+    if errors not in ('raise', 'warn', 'ignore'):
+        raise Exception(f'Unknown errors mode "{errors}"')
+    with _open_text(filename) as handle:
+        chunks = _read_line_chunks(handle, chunk_lines)
+        if processes is None or processes <= 1:
+            decoded_chunks = map(_decode_json_lines, chunks)
+            yield from _check_decoded(decoded_chunks, errors)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+                yield from _check_decoded(_bounded_map(pool, _decode_json_lines, chunks, 2 * processes), errors)
+
+def import_jsonl(filename : str, **kwargs) -> list[dict]:
+    return list(iter_jsonl(filename, **kwargs))
+
+TABLE_CACHE_DIR = './.table_cache'
+
+def file_hash(filename : str) -> str:
+    h = hashlib.sha1()
+    with open(filename, 'rb') as handle:
+        for chunk in iter(lambda : handle.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _read_source_table(filename : str, **read_kwargs) -> pd.DataFrame:
+    if os.path.splitext(filename)[1].lower() in ('.xlsx', '.xls'):
+        return pd.read_excel(filename, **read_kwargs)
+    return pd.read_csv(filename, **read_kwargs)
+
+def _write_cached_table(df : pd.DataFrame, cache_base : str) -> str:
+    # Feather when pyarrow is installed and can hold the columns, pickled DataFrame otherwise
+    try:
+        df.to_feather(cache_base + '.feather')
+        return cache_base + '.feather'
+    except Exception:
+        if os.path.exists(cache_base + '.feather'):
+            os.remove(cache_base + '.feather')
+    df.to_pickle(cache_base + '.pkl')
+    return cache_base + '.pkl'
+
+def load_table(filename : str, cache_dir : str = TABLE_CACHE_DIR, **read_kwargs) -> pd.DataFrame:
+    # pd.read_excel / pd.read_csv, served from a binary cache after the first load. The cache entry is
+    # keyed by the source path and read arguments, and is rebuilt when the source content changes.
+    key = hashlib.sha1(repr((os.path.abspath(filename), sorted(read_kwargs.items()))).encode()).hexdigest()[:16]
+    cache_base = os.path.join(cache_dir, f'{os.path.basename(filename)}.{key}')
+    meta_file = cache_base + '.meta.json'
+    mtime = os.path.getmtime(filename)
+    if os.path.exists(meta_file):
+        with open(meta_file, 'r', encoding='utf-8') as handle:
+            meta = json.load(handle)
+        if os.path.exists(meta['cache_file']):
+            is_fresh = meta['mtime'] == mtime
+            if not is_fresh and meta['hash'] == file_hash(filename): # touched, not changed
+                meta['mtime'] = mtime
+                with open(meta_file, 'w', encoding='utf-8') as handle:
+                    json.dump(meta, handle)
+                is_fresh = True
+            if is_fresh:
+                if meta['cache_file'].endswith('.feather'):
+                    return pd.read_feather(meta['cache_file'])
+                return pd.read_pickle(meta['cache_file'])
+    df = _read_source_table(filename, **read_kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = _write_cached_table(df, cache_base)
+    with open(meta_file, 'w', encoding='utf-8') as handle:
+        json.dump({'source':filename, 'mtime':mtime, 'hash':file_hash(filename), 'cache_file':cache_file}, handle)
+    return df
 
 def csv_to_word_pairs(filename : str, initial_label : str, final_label) -> list[tuple[str, str]]:
     data = pd.read_csv(filename, sep='\t', encoding='utf-8')
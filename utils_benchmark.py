@@ -0,0 +1,21 @@
+import shutil
+import tempfile
+import time
+
+import utils
+
+if __name__ == "__main__":
+    sources = [('./data/Nons_Phon_Syll3.xlsx', {}),
+               ('./data/DexDiminutivesSyllabic.xlsx', {}),
+               ('./data/substantive_plural.csv', {'sep':'\t', 'encoding':'utf-8'})]
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for filename, read_kwargs in sources:
+            timings = []
+            for run in ('cold', 'warm'):
+                start = time.perf_counter()
+                df = utils.load_table(filename, cache_dir, **read_kwargs)
+                timings.append(time.perf_counter() - start)
+            print(f'{filename}: {len(df)} rows, cold {timings[0]:.3f}s, warm {timings[1]:.3f}s')
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,189 @@
+import math
+
+import numpy as np
+
+from vector_table import WordVectorTable
+
+SEARCH_BLOCK = 8192 # table rows scored per matrix multiply
+QUERY_BLOCK = 256
+
+def _squared_norms(x : np.ndarray) -> np.ndarray:
+    return np.einsum('ij,ij->i', x, x, dtype=np.float64).astype(np.float32)
+
+def _nearest_centroids(x : np.ndarray, centroids : np.ndarray, n : int = 1) -> np.ndarray:
+    # indices of the n nearest centroids (squared euclidean) for each row of x, nearest first
+    c_norms = _squared_norms(centroids)
+    result = np.empty((len(x), n), dtype=np.int64)
+    for start in range(0, len(x), SEARCH_BLOCK):
+        d = c_norms[None, :] - 2 * (x[start:start + SEARCH_BLOCK] @ centroids.T)
+        if n == 1:
+            result[start:start + SEARCH_BLOCK, 0] = np.argmin(d, axis=1)
+            continue
+        part = np.argpartition(d, n - 1, axis=1)[:, :n]
+        order = np.argsort(np.take_along_axis(d, part, axis=1), axis=1)
+        result[start:start + SEARCH_BLOCK] = np.take_along_axis(part, order, axis=1)
+    return result
+
+def _kmeans(x : np.ndarray, n_clusters : int, iterations : int, rng : np.random.Generator) -> np.ndarray:
+    # plain Lloyd iterations; an empty cluster keeps its previous centroid
+    centroids = x[rng.choice(len(x), n_clusters, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assign = _nearest_centroids(x, centroids)[:, 0]
+        counts = np.bincount(assign, minlength=n_clusters)
+        order = np.argsort(assign, kind='stable')
+        filled = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        sums = np.add.reduceat(x[order], starts, axis=0, dtype=np.float64)
+        centroids[filled] = (sums / counts[filled, None]).astype(np.float32)
+    return centroids
+
+def _top_k(dists : np.ndarray, ids : np.ndarray, k : int) -> tuple[np.ndarray, np.ndarray]:
+    # the k smallest distances of each row, ascending (ties by id)
+    if dists.shape[1] > k:
+        part = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        dists, ids = np.take_along_axis(dists, part, axis=1), np.take_along_axis(ids, part, axis=1)
+    order = np.lexsort((ids, dists), axis=-1)
+    return np.take_along_axis(dists, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+class VectorIndex:
+    # top-k nearest neighbours over the rows of a WordVectorTable, without an all-pairs distance table.
+    # Exact search multiplies blocks of queries against blocks of the table. After build_ivf, search
+    # only scans the n_probe nearest k-means lists, optionally scoring them with product-quantized
+    # residual codes and re-ranking the best approximate candidates exactly.
+    # Cosine search works on unit vectors, where euclidean distance d gives cosine distance d**2 / 2.
+    def __init__(self, table : WordVectorTable, metric : str = 'cosine'):
+        if metric not in ('euclidean', 'cosine'):
+            raise Exception(f'Unknown metric {metric}')
+        self.table = table
+        self.metric = metric
+        self.centroids : np.ndarray = None
+        self.list_rows : np.ndarray = None # table rows grouped by list
+        self.list_offsets : np.ndarray = None
+        self.codebooks : np.ndarray = None # (subvectors, centroids per subvector, subvector dims)
+        self.codes : np.ndarray = None # PQ codes of the residuals, in list_rows order
+        self.n_probe = 8
+
+    def _prepare(self, x : np.ndarray, norms : np.ndarray = None) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        if self.metric == 'euclidean':
+            return x
+        if norms is None:
+            norms = np.sqrt(_squared_norms(x))
+        norms = np.where(norms == 0, 1, norms).astype(np.float32)
+        return x / norms[:, None]
+
+    def _table_rows(self, rows) -> np.ndarray:
+        return self._prepare(self.table.matrix[rows], self.table.norms[rows])
+
+    def _to_metric(self, squared : np.ndarray) -> np.ndarray:
+        squared = np.maximum(squared, 0)
+        return squared / 2 if self.metric == 'cosine' else np.sqrt(squared)
+
+    @property
+    def has_ivf(self) -> bool:
+        return self.centroids is not None
+
+    def build_ivf(self, n_lists : int = None, n_probe : int = 8, pq_subvectors : int = None, pq_bits : int = 8,
+                  train_size : int = 50000, iterations : int = 10, seed : int = 0) -> 'VectorIndex':
+        n_rows, dims = self.table.matrix.shape
+        if n_lists is None:
+            n_lists = max(1, int(4 * math.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        rng = np.random.default_rng(seed)
+        train_rows = np.sort(rng.choice(n_rows, min(train_size, n_rows), replace=False))
+        train = self._table_rows(train_rows)
+        self.centroids = _kmeans(train, n_lists, iterations, rng)
+        assign = np.concatenate([_nearest_centroids(self._table_rows(np.arange(s, min(s + SEARCH_BLOCK, n_rows))),
+                                                    self.centroids)[:, 0]
+                                 for s in range(0, n_rows, SEARCH_BLOCK)])
+        self.list_rows = np.argsort(assign, kind='stable')
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+        self.n_probe = n_probe
+        self.codebooks, self.codes = None, None
+        if pq_subvectors:
+            if dims % pq_subvectors:
+                raise Exception(f'{dims} dimensions cannot be split into {pq_subvectors} subvectors')
+            n_codes = min(2 ** pq_bits, len(train))
+            sub_dims = dims // pq_subvectors
+            residuals = train - self.centroids[_nearest_centroids(train, self.centroids)[:, 0]]
+            self.codebooks = np.stack([_kmeans(residuals[:, j*sub_dims:(j+1)*sub_dims], n_codes, iterations, rng)
+                                       for j in range(pq_subvectors)])
+            self.codes = np.empty((n_rows, pq_subvectors), dtype=np.uint8 if n_codes <= 256 else np.uint16)
+            for start in range(0, n_rows, SEARCH_BLOCK):
+                rows = self.list_rows[start:start + SEARCH_BLOCK]
+                residuals = self._table_rows(rows) - self.centroids[assign[rows]]
+                for j in range(pq_subvectors):
+                    self.codes[start:start + SEARCH_BLOCK, j] = _nearest_centroids(
+                        residuals[:, j*sub_dims:(j+1)*sub_dims], self.codebooks[j])[:, 0]
+        return self
+
+    def _exact_search(self, queries : np.ndarray, k : int) -> tuple[np.ndarray, np.ndarray]:
+        n_rows = len(self.table)
+        best_d = np.empty((len(queries), 0), dtype=np.float32)
+        best_i = np.empty((len(queries), 0), dtype=np.int64)
+        q_norms = _squared_norms(queries)
+        for start in range(0, n_rows, SEARCH_BLOCK):
+            rows = np.arange(start, min(start + SEARCH_BLOCK, n_rows))
+            block = self._table_rows(rows)
+            d = q_norms[:, None] + _squared_norms(block)[None, :] - 2 * (queries @ block.T)
+            best_d, best_i = _top_k(np.concatenate([best_d, d], axis=1),
+                                    np.concatenate([best_i, np.broadcast_to(rows, d.shape)], axis=1), k)
+        # the expanded form loses precision for near neighbours, so the winners are re-scored directly
+        diff = self._table_rows(best_i.ravel()).reshape(best_i.shape + (-1,)) - queries[:, None, :]
+        return _top_k(np.einsum('ijk,ijk->ij', diff, diff), best_i, k)
+
+    def _ivf_search(self, query : np.ndarray, lists : np.ndarray, k : int, rerank : int) \
+            -> tuple[np.ndarray, np.ndarray]:
+        spans = [(self.list_offsets[l], self.list_offsets[l+1]) for l in lists]
+        positions = np.concatenate([np.arange(a, b) for a, b in spans])
+        rows = self.list_rows[positions]
+        if self.codes is None or len(rows) <= rerank:
+            block = self._table_rows(rows)
+            diff = block - query
+            return _top_k(np.einsum('ij,ij->i', diff, diff)[None, :], rows[None, :], k)
+        # asymmetric distance: per list, a (subvector, code) table of distances from the query residual
+        n_sub, n_codes, sub_dims = self.codebooks.shape
+        approx = np.empty(len(rows), dtype=np.float32)
+        done = 0
+        for l, (a, b) in zip(lists, spans):
+            residual = (query - self.centroids[l]).reshape(n_sub, 1, sub_dims)
+            table = np.sum((self.codebooks - residual) ** 2, axis=2)
+            codes = self.codes[a:b]
+            approx[done:done + b - a] = table[np.arange(n_sub), codes].sum(axis=1)
+            done += b - a
+        _, candidates = _top_k(approx[None, :], rows[None, :], rerank)
+        diff = self._table_rows(candidates[0]) - query
+        return _top_k(np.einsum('ij,ij->i', diff, diff)[None, :], candidates, k)
+
+    def search(self, queries : np.ndarray, k : int = 10, exact : bool = None, n_probe : int = None,
+               rerank : int = None) -> tuple[np.ndarray, np.ndarray]:
+        # (distances, table rows) of the k nearest rows to each query vector, nearest first;
+        # IVF search is used when built unless exact=True, and may return fewer than k rows (padded with -1)
+        queries = np.atleast_2d(queries)
+        queries = self._prepare(queries)
+        k = min(k, len(self.table))
+        if exact or (exact is None and not self.has_ivf):
+            dists, rows = np.empty((len(queries), k), dtype=np.float32), np.empty((len(queries), k), dtype=np.int64)
+            for start in range(0, len(queries), QUERY_BLOCK):
+                dists[start:start + QUERY_BLOCK], rows[start:start + QUERY_BLOCK] = \
+                    self._exact_search(queries[start:start + QUERY_BLOCK], k)
+            return self._to_metric(dists), rows
+        if not self.has_ivf:
+            raise Exception('IVF search requested before build_ivf')
+        n_probe = n_probe or self.n_probe
+        rerank = max(k, rerank or 10 * k)
+        dists, rows = np.full((len(queries), k), np.inf, dtype=np.float32), np.full((len(queries), k), -1)
+        probe_lists = _nearest_centroids(queries, self.centroids, min(n_probe, len(self.centroids)))
+        for i, (query, lists) in enumerate(zip(queries, probe_lists)):
+            d, r = self._ivf_search(query, lists, k, rerank)
+            dists[i, :d.shape[1]], rows[i, :d.shape[1]] = d[0], r[0]
+        return self._to_metric(dists), rows
+
+    def neighbours(self, word : str, k : int = 10, **search_kwargs) -> list[tuple[str, float]]:
+        # k nearest other words in the table, with their distances
+        if word not in self.table:
+            return []
+        dists, rows = self.search(self.table[word], k + 1, **search_kwargs)
+        found = [(self.table.vocab[r], d) for r, d in zip(rows[0].tolist(), dists[0].tolist())
+                 if r >= 0 and self.table.vocab[r] != word]
+        return found[:k]
@@ -0,0 +1,33 @@
+import time
+
+import numpy as np
+
+from vector_table import WordVectorTable
+from vector_index import VectorIndex
+
+if __name__ == "__main__":
+    # clustered random vectors shaped like the noun tables (300 dims)
+    rng = np.random.default_rng(0)
+    n_rows, dims, n_queries, k = 100000, 300, 500, 10
+    centers = rng.normal(size=(200, dims))
+    matrix = (centers[rng.integers(0, len(centers), n_rows)] + 0.7 * rng.normal(size=(n_rows, dims))).astype(np.float32)
+    table = WordVectorTable([f'w{i}' for i in range(n_rows)], matrix)
+    queries = matrix[rng.choice(n_rows, n_queries, replace=False)]
+
+    index = VectorIndex(table, 'cosine')
+    start = time.perf_counter()
+    _, exact_rows = index.search(queries, k)
+    exact_time = time.perf_counter() - start
+    print(f'exact: {n_queries / exact_time:.0f} queries/s')
+
+    for label, build_kwargs in (('ivf', {}), ('ivf+pq', {'pq_subvectors':30})):
+        start = time.perf_counter()
+        index.build_ivf(**build_kwargs)
+        build_time = time.perf_counter() - start
+        for n_probe in (4, 16):
+            start = time.perf_counter()
+            _, rows = index.search(queries, k, n_probe=n_probe)
+            search_time = time.perf_counter() - start
+            recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(exact_rows.tolist(), rows.tolist())])
+            print(f'{label} (build {build_time:.1f}s) n_probe={n_probe}: {n_queries / search_time:.0f} queries/s, '
+                  f'recall@{k} {recall:.3f}')
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+
+VOCAB_FILE = 'vocab.txt'
+MATRIX_FILE = 'vectors.npy'
+METRICS = ('euclidean', 'cosine')
+PAIR_BLOCK = 4096 # rows per block when differencing pairs, bounds the temporary memory
+
+class WordVectorTable:
+    # word -> vector mapping backed by one contiguous matrix and a vocabulary index; a table loaded with
+    # mmap pickles as its path, so worker processes map the same pages instead of receiving a copy
+    def __init__(self, vocab : list[str], matrix : np.ndarray, path : str = None):
+        if len(vocab) != len(matrix):
+            raise Exception('Vocabulary and matrix lengths differ.')
+        self.vocab = vocab
+        self.index = {w:i for i, w in enumerate(vocab)}
+        self.matrix = matrix
+        self.path = path
+        self._norms = None
+
+    @staticmethod
+    def from_dict(vectors : dict[str, np.ndarray], dtype = np.float32) -> 'WordVectorTable':
+        vocab = list(vectors.keys())
+        matrix = np.array([vectors[w] for w in vocab], dtype=dtype)
+        return WordVectorTable(vocab, matrix)
+
+    @staticmethod
+    def from_keyed_vectors(keyed_vectors, dtype = np.float32) -> 'WordVectorTable':
+        # gensim KeyedVectors
+        return WordVectorTable(list(keyed_vectors.index_to_key), np.asarray(keyed_vectors.vectors, dtype=dtype))
+
+    def save(self, directory : str):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, VOCAB_FILE), 'w', encoding='utf-8') as handle:
+            handle.write('\n'.join(self.vocab))
+        np.save(os.path.join(directory, MATRIX_FILE), np.ascontiguousarray(self.matrix))
+
+    @staticmethod
+    def load(directory : str, mmap : bool = True) -> 'WordVectorTable':
+        with open(os.path.join(directory, VOCAB_FILE), 'r', encoding='utf-8') as handle:
+            vocab = handle.read().split('\n')
+        matrix = np.load(os.path.join(directory, MATRIX_FILE), mmap_mode='r' if mmap else None)
+        if not len(matrix):
+            vocab = []
+        return WordVectorTable(vocab, matrix, directory if mmap else None)
+
+    def __reduce__(self):
+        if self.path is not None:
+            return WordVectorTable.load, (self.path, True)
+        return WordVectorTable, (self.vocab, np.asarray(self.matrix))
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def __contains__(self, word : str) -> bool:
+        return word in self.index
+
+    def __getitem__(self, word : str) -> np.ndarray:
+        return self.matrix[self.index[word]]
+
+    def get(self, word : str, default = None) -> np.ndarray | None:
+        i = self.index.get(word)
+        return default if i is None else self.matrix[i]
+
+    def keys(self) -> list[str]:
+        return self.vocab
+
+    @property
+    def norms(self) -> np.ndarray:
+        # row norms, computed once (float64)
+        if self._norms is None:
+            self._norms = np.sqrt(np.einsum('ij,ij->i', self.matrix, self.matrix, dtype=np.float64))
+        return self._norms
+
+    def indices(self, words : list[str]) -> np.ndarray:
+        # row of each word, -1 if not in the vocabulary
+        return np.fromiter((self.index.get(w, -1) for w in words), dtype=np.int64, count=len(words))
+
+    def pair_distances(self, words_a : list[str], words_b : list[str], metric : str = 'euclidean') -> np.ndarray:
+        # distance between words_a[i] and words_b[i]; nan where either word has no vector
+        if len(words_a) != len(words_b):
+            raise Exception('Word lists of different lengths.')
+        if metric not in METRICS:
+            raise Exception(f'Unknown metric {metric}')
+        idx_a, idx_b = self.indices(words_a), self.indices(words_b)
+        found = np.flatnonzero((idx_a >= 0) & (idx_b >= 0))
+        dists = np.full(len(idx_a), np.nan)
+        for start in range(0, len(found), PAIR_BLOCK):
+            rows = found[start:start + PAIR_BLOCK]
+            a, b = self.matrix[idx_a[rows]], self.matrix[idx_b[rows]]
+            if metric == 'euclidean':
+                diff = (a - b).astype(np.float64)
+                dists[rows] = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+            else:
+                dots = np.einsum('ij,ij->i', a, b, dtype=np.float64)
+                dists[rows] = 1 - dots / (self.norms[idx_a[rows]] * self.norms[idx_b[rows]])
+        return dists
+
+    def distances_to(self, query : str | np.ndarray, words : list[str] = None, metric : str = 'euclidean') -> np.ndarray:
+        # distance from one word (or vector) to each of words, or to the whole vocabulary;
+        # uses the precomputed row norms, nan for words without a vector
+        if metric not in METRICS:
+            raise Exception(f'Unknown metric {metric}')
+        vec = self[query] if isinstance(query, str) else np.asarray(query)
+        vec = vec.astype(np.float64)
+        vec_norm = float(np.sqrt(vec @ vec))
+        if words is None:
+            rows, dists = np.arange(len(self.vocab)), np.empty(len(self.vocab))
+            found = rows
+        else:
+            rows, dists = self.indices(words), np.full(len(words), np.nan)
+            found = np.flatnonzero(rows >= 0)
+            rows = rows[found]
+        dots = self.matrix[rows] @ vec
+        row_norms = self.norms[rows]
+        if metric == 'euclidean':
+            dists[found] = np.sqrt(np.maximum(row_norms**2 + vec_norm**2 - 2*dots, 0))
+        else:
+            dists[found] = 1 - dots / (row_norms * vec_norm)
+        return dists
@@ -1,26 +1,41 @@
 import dataclasses
+import functools
 import re
-from collections import defaultdict
-
-
-def string_to_list(s : str, multi_char_tokens : set[str]) -> list[str]:
-    multi_char_dict = defaultdict(list)
-    for tok in multi_char_tokens:
-        multi_char_dict[len(tok)].append(tok)
-    lens = list(set(multi_char_dict.keys()))
-    lens.sort(reverse=True)
-    tok_list = []
-    while s:
-        is_multi = False
-        for tok_len in lens:
-            if s[:tok_len] in multi_char_dict[tok_len]:
-                is_multi = True
-                break
-        if not is_multi:
-            tok_len = 1
-        tok_list.append(s[:tok_len])
-        s = s[tok_len:]
-    return tok_list
+from array import array
+from typing import Iterable
+
+
+class Tokenizer:
+    # splits a string into symbols, taking the longest multi-character token at each position;
+    # compiled once into a regex alternation, longest tokens first
+    def __init__(self, multi_char_tokens : Iterable[str]):
+        self.tokens = frozenset([tok for tok in multi_char_tokens if tok])
+        alternatives = [re.escape(tok) for tok in sorted(self.tokens, key=lambda tok : -len(tok))] + ['.']
+        self.regex = re.compile('|'.join(alternatives), re.DOTALL)
+
+    def __call__(self, s : str) -> list[str]:
+        return self.regex.findall(s)
+
+_tokenizers : dict[frozenset[str], Tokenizer] = {}
+
+def get_tokenizer(multi_char_tokens : Iterable[str] | Tokenizer) -> Tokenizer:
+    if isinstance(multi_char_tokens, Tokenizer):
+        return multi_char_tokens
+    multi_char_tokens = frozenset(multi_char_tokens)
+    if multi_char_tokens not in _tokenizers:
+        _tokenizers[multi_char_tokens] = Tokenizer(multi_char_tokens)
+    return _tokenizers[multi_char_tokens]
+
+def string_to_list(s : str, multi_char_tokens : set[str] | Tokenizer) -> list[str]:
+    return get_tokenizer(multi_char_tokens)(s)
+
+_center_regexes : dict[str, re.Pattern] = {}
+
+def center_regex(center_chars : set[str]) -> re.Pattern:
+    center_key = "".join(center_chars)
+    if center_key not in _center_regexes:
+        _center_regexes[center_key] = re.compile(rf'[{center_key}]+')
+    return _center_regexes[center_key]
 
 @dataclasses.dataclass
 class Syllable:
@@ -49,7 +64,7 @@ class Syllable:
     @staticmethod
     def from_string(src : str, center_chars : set[str],
                     **kwargs) -> 'Syllable':
-        m = re.search(rf'[{"".join(center_chars)}]+', src)
+        m = center_regex(center_chars).search(src)
         if not m:
             raise Exception(f"Syllable {src} has no center.")
         onset = src[:m.start()]
@@ -59,7 +74,7 @@ class Syllable:
         d.update({k:bool(kwargs.get(k)) for k in ('stressed',)})
         return Syllable(**d)
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Sound:
     symbol : str
     word_index : int
@@ -99,15 +114,21 @@ class Word(list[Sound]):
     def symbol_list(self) -> list[str]:
         return [ph.symbol for ph in self]
     @staticmethod
-    def from_syllables(sylls : list[Syllable], mult_char_toks : set[str] = None) -> 'Word':
+    def from_syllables(sylls : list[Syllable], mult_char_toks : set[str] | Tokenizer = None) -> 'Word':
+        tokenizer = get_tokenizer(mult_char_toks) if mult_char_toks else None
+        parts = [[tokenizer(part) if tokenizer else part for part in (syl.onset, syl.center, syl.coda)]
+                 for syl in sylls]
+        return Word._from_parts(sylls, parts)
+
+    @staticmethod
+    def _from_parts(sylls : list[Syllable], syl_parts : list) -> 'Word':
+        # syl_parts holds the (onset, center, coda) symbols of every syllable
         sound_list = []
         phon_i = 0
-        for s_i, syl in enumerate(sylls):
+        for s_i, (syl, parts) in enumerate(zip(sylls, syl_parts)):
             syl_len = len(syl.to_string())
             index_in_syllable = 0
-            for part_name, part in zip(['onset', 'center', 'coda'], [syl.onset, syl.center, syl.coda]):
-                if mult_char_toks:
-                    part = string_to_list(part, mult_char_toks)
+            for part_name, part in zip(['onset', 'center', 'coda'], parts):
                 for ph in part:
                     sound = Sound(symbol=ph, word_index=phon_i, syllable_index=s_i,
                                   syllable_part=part_name,
@@ -125,17 +146,129 @@ class Word(list[Sound]):
         return Word(sound_list)
 
     @staticmethod
-    def from_string(src : str, center_chars : set[str], mult_char_toks : set[str] = None,
+    def from_string(src : str, center_chars : set[str], mult_char_toks : set[str] | Tokenizer = None,
                     **kwargs) -> 'Word':
         syl_split_token = kwargs.get('syl_split_token') if kwargs.get('syl_split_token') else '-'
         stress_token = kwargs.get('stress_token') if kwargs.get('stress_token') else '"'
+        tokenizer = get_tokenizer(mult_char_toks) if mult_char_toks else None
+        center_key = "".join(center_chars)
+
+        parsed = [_parse_syllable(syl_str, stress_token, center_key, tokenizer)
+                  for syl_str in src.split(syl_split_token)]
+        return Word._from_parts([syl for syl, _ in parsed], [parts for _, parts in parsed])
+
+def _parse_syllable_uncached(syl_str : str, stress_token : str, center_key : str, tokenizer : Tokenizer | None) \
+        -> tuple[Syllable, tuple]:
+    # center_key is the joined center chars, which builds the same character class as the set
+    is_stressed = stress_token in syl_str
+    syl = Syllable.from_string(syl_str.replace(stress_token, ''), center_key)
+    syl.stressed = is_stressed
+    parts = tuple([tokenizer(part) if tokenizer else part for part in (syl.onset, syl.center, syl.coda)])
+    return syl, parts
+
+SYLLABLE_CACHE_SIZE = 16384
+
+# the syllable inventory is small, so Word.from_string mostly hits this cache; entries are shared, not copied
+_parse_syllable = functools.lru_cache(maxsize=SYLLABLE_CACHE_SIZE)(_parse_syllable_uncached)
+
+def set_syllable_cache_size(maxsize : int | None):
+    global _parse_syllable
+    _parse_syllable = functools.lru_cache(maxsize=maxsize)(_parse_syllable_uncached)
+
+def syllable_cache_info() -> tuple:
+    return _parse_syllable.cache_info()
+
+def syllable_cache_clear():
+    _parse_syllable.cache_clear()
+
+# symbols are interned once for all compact words
+_symbols : list[str] = []
+_symbol_ids : dict[str, int] = {}
+
+def _symbol_id(symbol : str) -> int:
+    if symbol not in _symbol_ids:
+        _symbol_ids[symbol] = len(_symbols)
+        _symbols.append(symbol)
+    return _symbol_ids[symbol]
+
+_SYLLABLE_PARTS = ('onset', 'center', 'coda')
+_SOUND_FLAGS = ('first_in_syllable', 'last_in_syllable', 'last_in_word', 'stressed_syllable', 'open_syllable',
+                'no_onset_syllable', 'final_syllable', 'is_center')
+_LAST_IN_WORD = 1 << (2 + _SOUND_FLAGS.index('last_in_word'))
+_STRIDE = 3 # symbol id, syllable index, flags (syllable part in the low 2 bits)
+
+class CompactWord:
+    # A Word packed into one array of unsigned shorts, three per sound. Sounds are built on demand, so a
+    # lexicon held in RAM costs a few bytes per phoneme instead of one Sound object each.
+    __slots__ = ('data', 'offset')
+
+    def __init__(self, data : array, offset : int = 0):
+        if not data:
+            raise Exception('Empty word!')
+        self.data = data
+        self.offset = offset # word_index of the first sound
+        self.data[-1] |= _LAST_IN_WORD
+
+    @staticmethod
+    def _pack(sound : Sound) -> list[int]:
+        flags = _SYLLABLE_PARTS.index(sound.syllable_part)
+        for i, flag in enumerate(_SOUND_FLAGS):
+            if getattr(sound, flag):
+                flags |= 1 << (2 + i)
+        return [_symbol_id(sound.symbol), sound.syllable_index, flags]
+
+    def _unpack(self, i : int) -> Sound:
+        symbol_id, syllable_index, flags = self.data[i * _STRIDE:(i + 1) * _STRIDE]
+        return Sound(_symbols[symbol_id], self.offset + i, syllable_index, _SYLLABLE_PARTS[flags & 3],
+                     *[bool(flags & (1 << (2 + j))) for j in range(len(_SOUND_FLAGS))])
+
+    @staticmethod
+    def from_word(word : list[Sound]) -> 'CompactWord':
+        data = array('H')
+        for sound in word:
+            data.extend(CompactWord._pack(sound))
+        return CompactWord(data, word[0].word_index if word else 0)
+
+    @staticmethod
+    def from_string(src : str, center_chars : set[str], mult_char_toks : set[str] | Tokenizer = None,
+                    **kwargs) -> 'CompactWord':
+        return CompactWord.from_word(Word.from_string(src, center_chars, mult_char_toks, **kwargs))
+
+    def to_word(self) -> Word:
+        return Word(list(self))
+
+    def __len__(self):
+        return len(self.data) // _STRIDE
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise Exception('Only contiguous slices of a CompactWord are supported')
+            # like Word(word[start:stop]), the last sound of the slice becomes last_in_word
+            return CompactWord(self.data[start * _STRIDE:stop * _STRIDE], self.offset + start)
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('CompactWord index out of range')
+        return self._unpack(item)
+
+    def __iter__(self):
+        return (self._unpack(i) for i in range(len(self)))
+
+    def __str__(self):
+        return ''.join(self.symbol_list())
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __eq__(self, other):
+        if isinstance(other, CompactWord):
+            return self.data == other.data and self.offset == other.offset
+        return list(self) == other
+
+    def symbol_list(self) -> list[str]:
+        return [_symbols[symbol_id] for symbol_id in self.data[::_STRIDE]]
 
-        syl_strings = src.split(syl_split_token)
-        syl_list = []
-        for syl_str in syl_strings:
-            is_stressed = stress_token in syl_str
-            syl_str = syl_str.replace(stress_token, '')
-            syl = Syllable.from_string(syl_str, center_chars)
-            syl.stressed = is_stressed
-            syl_list.append(syl)
-        return Word.from_syllables(syl_list, mult_char_toks)
+    def to_dicts(self) -> list[dict]:
+        return [sound.to_dict() for sound in self]
@@ -10,6 +10,7 @@ from numpy.linalg import norm
 import torch
 
 import utils
+from embedding_cache import EmbeddingCache
 
 def vec_distance(a : np.ndarray, b : np.ndarray) -> float:
     return float(norm(a - b))
@@ -38,11 +39,45 @@ def bert_encode_text(text : str, model : BertModel, tokenizer : BertTokenizer)\
         -> list[tuple[str, np.ndarray]]:
     input_ids = torch.tensor(tokenizer.encode(text, add_special_tokens=True)).unsqueeze(0)
     tokens = tokenizer.batch_decode(input_ids[0])[1:-1] # skip special tokens
-    outputs = model(input_ids)
+    with torch.inference_mode():
+        outputs = model(input_ids)
     last_hidden_states = outputs[0]
     token_vectors = [t.detach().numpy() for t in last_hidden_states[0][1:-1]] # skip special tokens
     return list(zip(tokens, token_vectors))
 
+def _pool_subwords(hidden : torch.Tensor, mask : torch.Tensor, pooling : str) -> torch.Tensor:
+    # one vector per word from its subword vectors (mask marks the word's own tokens)
+    if pooling == 'mean':
+        mask = mask.unsqueeze(-1).to(hidden.dtype)
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+    if pooling == 'first':
+        return hidden[torch.arange(len(hidden)), mask.int().argmax(dim=1)]
+    raise Exception(f'Unknown pooling {pooling}')
+
+def bert_encode_words(words : list[str], model : BertModel, tokenizer : BertTokenizer, batch_size : int = 64,
+                      pooling : str = 'mean', cache : EmbeddingCache = None, model_id : str = None) -> np.ndarray:
+    # (len(words), hidden size) float32 matrix, one pooled vector per word. Words are encoded in padded
+    # batches of similar length under inference mode; with a cache, only words it doesn't have are encoded.
+    model_id = model_id or f'{model.name_or_path}:{pooling}'
+    unique_words = list(dict.fromkeys(words))
+    vectors = cache.get_many(model_id, unique_words) if cache is not None else {}
+    missing = sorted([w for w in unique_words if w not in vectors], key=len)
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        encoding = tokenizer(batch, padding=True, truncation=True, return_tensors='pt',
+                             return_special_tokens_mask=True)
+        word_mask = encoding['attention_mask'].bool() & ~encoding['special_tokens_mask'].bool()
+        with torch.inference_mode():
+            hidden = model(input_ids=encoding['input_ids'], attention_mask=encoding['attention_mask'])[0]
+            pooled = _pool_subwords(hidden, word_mask, pooling).float().numpy()
+        batch_vectors = dict(zip(batch, pooled))
+        if cache is not None:
+            cache.put_many(model_id, batch_vectors)
+        vectors.update(batch_vectors)
+    if not words:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+    return np.stack([vectors[w] for w in words]).astype(np.float32, copy=False)
+
 
 def df_to_tokenized_dataset(tokenizer, df: pd.DataFrame, column_dict: dict[str, str] = None,
                             split_ratio = 0.25) -> DatasetDict:
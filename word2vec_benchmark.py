@@ -0,0 +1,43 @@
+import os
+import tempfile
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+import utils
+from embedding_cache import EmbeddingCache
+from word2vec import bert_encode_text, bert_encode_words
+
+MODEL_NAME = 'dumitrescustefan/bert-base-romanian-cased-v1'
+
+if __name__ == "__main__":
+    # CPU throughput over the Dex diminutives and their sources
+    torch.set_grad_enabled(False)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = AutoModel.from_pretrained(MODEL_NAME).eval()
+    df = utils.load_table('./data/DexDiminutivesSyllabic.xlsx')
+    words = list(dict.fromkeys(df['diminutiv'].dropna().tolist() + df['sursa'].dropna().tolist()))
+    print(f'{len(words)} words, {torch.get_num_threads()} threads')
+
+    sample = words[:200]
+    start = time.perf_counter()
+    for w in sample:
+        bert_encode_text(w, model, tokenizer)
+    elapsed = time.perf_counter() - start
+    print(f'one word per forward pass: {len(sample) / elapsed:.0f} words/s')
+
+    for batch_size in (16, 64, 256):
+        start = time.perf_counter()
+        bert_encode_words(words, model, tokenizer, batch_size)
+        elapsed = time.perf_counter() - start
+        print(f'batch_size={batch_size}: {len(words) / elapsed:.0f} words/s')
+
+    cache_file = os.path.join(tempfile.mkdtemp(), 'embeddings.db')
+    with EmbeddingCache(cache_file) as cache:
+        for run in ('cold', 'warm'):
+            start = time.perf_counter()
+            bert_encode_words(words, model, tokenizer, cache=cache)
+            elapsed = time.perf_counter() - start
+            print(f'cached ({run}): {len(words) / elapsed:.0f} words/s')
+    os.remove(cache_file)
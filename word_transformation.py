@@ -1,6 +1,11 @@
 import dataclasses
+import json
+import math
+import sqlite3
+from array import array
+from collections import OrderedDict
 from enum import Enum
-from typing import List, Tuple, Callable
+from typing import List, Tuple, Callable, Iterator
 
 
 def simple_string_distance(s : str, t : str) -> int:
@@ -118,13 +123,31 @@ def add_BOS_EOS(s : str | List[str]) -> str | List[str]:
         return BOS + s + EOS
     return [BOS] + s + [EOS]
 
-def distance(w1 : str|List[str], w2 : str|List[str], cost_fn : Callable[[str, str], float] = None) -> ModMatrix:
+def _diagonal_band(rows : int, cols : int, min_del : float, min_ins : float, max_cost : float) -> Tuple[int, int]:
+    # diagonals k = j - i that a path costing at most max_cost can visit: reaching (i, j) and going on to the
+    # last cell takes at least the deletions and insertions counted below (empty if lo > hi)
+    last = (cols - 1) - (rows - 1)
+    allowed = [k for k in range(-(rows - 1), cols)
+               if min_del * (max(0, -k) + max(0, k - last)) + min_ins * (max(0, k) + max(0, last - k)) <= max_cost]
+    return (allowed[0], allowed[-1]) if allowed else (1, 0)
+
+def distance(w1 : str|List[str], w2 : str|List[str], cost_fn : Callable[[str, str], float] = None,
+             max_cost : float = None) -> ModMatrix | None:
+    # with max_cost, only the diagonal band that can stay under max_cost is filled (cells outside it cost inf),
+    # and None (over threshold) is returned as soon as a whole column, or the final distance, exceeds it
     if cost_fn is None:
         cost_fn = lambda i, o : 1
 
     w1, w2 = add_BOS_EOS(w1), add_BOS_EOS(w2)
     rows = len(w1)
     cols = len(w2)
+    k_lo, k_hi = -(rows - 1), cols - 1
+    if max_cost is not None: # edges cost 1 per step
+        min_del = min([1] + [cost_fn(s, '') for s in w1[1:]])
+        min_ins = min([1] + [cost_fn('', s) for s in w2[1:]])
+        k_lo, k_hi = _diagonal_band(rows, cols, min_del, min_ins, max_cost)
+        if k_lo > k_hi:
+            return None
     matrix = ModMatrix(rows, cols)
     # init edges of matrix
     for i in range(1, rows):
@@ -135,7 +158,11 @@ def distance(w1 : str|List[str], w2 : str|List[str], cost_fn : Callable[[str, st
         matrix[0][j] = MatrixCell([Modification(Operation.Ins(w2[j]), j, (0, j - 1))])
     # populate matrix
     for j in range(1, cols):
-        for i in range(1, rows):
+        i_start, i_stop = max(1, j - k_hi), min(rows - 1, j - k_lo) # band rows of column j
+        if max_cost is not None:
+            for i in list(range(1, i_start)) + list(range(i_stop + 1, rows)):
+                matrix[i][j] = MatrixCell(cost=math.inf)
+        for i in range(i_start, i_stop + 1):
             substitution_cost = 0 if w1[i] == w2[j] else cost_fn(w1[i], w2[j])
             del_cost = cost_fn(w1[i], '')
             ins_cost = cost_fn('', w2[j])
@@ -149,6 +176,191 @@ def distance(w1 : str|List[str], w2 : str|List[str], cost_fn : Callable[[str, st
             min_cost = min([m.cost for m in options])
             options = [m for m in options if m.cost == min_cost]
             matrix[i][j] = MatrixCell(options)
+        if max_cost is not None and min([matrix[i][j].cost for i in range(0, rows)]) > max_cost:
+            return None
+    if max_cost is not None and matrix[rows - 1][cols - 1].cost > max_cost:
+        return None
+    return matrix
+
+# backpointer bits for CostMatrix
+DEL_MOVE = 1
+INS_MOVE = 2
+SUB_MOVE = 4
+NOP_MOVE = 8
+
+class CostMatrix:
+    # array-backed alternative to ModMatrix: only costs and backpointer bitmasks are stored,
+    # Modification objects are built on demand during traceback
+    def __init__(self, w1 : List[str], w2 : List[str]):
+        self.w1 = w1
+        self.w2 = w2
+        self.rows = len(w1)
+        self.cols = len(w2)
+        self.costs = array('d', bytes(8 * self.rows * self.cols))
+        self.moves = bytearray(self.rows * self.cols)
+    def cost(self, i : int, j : int) -> float:
+        return self.costs[i * self.cols + j]
+    def at(self, *args) -> MatrixCell:
+        if len(args) == 1 and len(args[0]) == 2:
+            i, j = args[0]
+        elif len(args) == 2:
+            i, j = args
+        else:
+            raise Exception('Number of args must be 1 or 2')
+        cost = self.costs[i * self.cols + j]
+        moves = self.moves[i * self.cols + j]
+        modifications = []
+        if moves & DEL_MOVE:
+            modifications.append(Modification(Operation.Del(self.w1[i]), cost, (i - 1, j)))
+        if moves & INS_MOVE:
+            modifications.append(Modification(Operation.Ins(self.w2[j]), cost, (i, j - 1)))
+        if moves & SUB_MOVE:
+            modifications.append(Modification(Operation.Sub(self.w1[i], self.w2[j]), cost, (i - 1, j - 1)))
+        elif moves & NOP_MOVE:
+            modifications.append(Modification(Operation.Nop(self.w1[i]), cost, (i - 1, j - 1)))
+        return MatrixCell(modifications, cost)
+
+class CostModel:
+    # A cost_fn compiled over a symbol inventory: symbols get integer ids that index a dense substitution
+    # matrix and insertion/deletion vectors, so the DP engine looks costs up instead of calling cost_fn.
+    # Symbols outside the inventory get ids on first use; entries are filled lazily, or all at once by compile().
+    # key names the costs for the TransformationCache; leave it None unless it identifies them across runs.
+    def __init__(self, cost_fn : Callable[[str, str], float], symbols : List[str] = (), compile : bool = True,
+                 key : str = None):
+        self.cost_fn = cost_fn
+        self.key = key
+        self.symbols : List[str] = []
+        self.ids : dict[str, int] = {}
+        self.sub_costs : List[List[float | None]] = [] # [id_in][id_out]
+        self.ins_costs : List[float | None] = []
+        self.del_costs : List[float | None] = []
+        for symbol in symbols:
+            self.symbol_id(symbol)
+        if compile:
+            self.compile()
+
+    def symbol_id(self, symbol : str) -> int:
+        i = self.ids.get(symbol)
+        if i is None:
+            i = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            for row in self.sub_costs:
+                row.append(None)
+            self.sub_costs.append([None] * len(self.symbols))
+            self.ins_costs.append(None)
+            self.del_costs.append(None)
+        return i
+
+    def encode(self, word : str|List[str]) -> List[int]:
+        return [self.symbol_id(s) for s in word]
+
+    def sub_cost(self, i : int, j : int) -> float:
+        cost = self.sub_costs[i][j]
+        if cost is None:
+            cost = self.sub_costs[i][j] = self.cost_fn(self.symbols[i], self.symbols[j])
+        return cost
+
+    def ins_cost(self, j : int) -> float:
+        cost = self.ins_costs[j]
+        if cost is None:
+            cost = self.ins_costs[j] = self.cost_fn('', self.symbols[j])
+        return cost
+
+    def del_cost(self, i : int) -> float:
+        cost = self.del_costs[i]
+        if cost is None:
+            cost = self.del_costs[i] = self.cost_fn(self.symbols[i], '')
+        return cost
+
+    def compile(self) -> 'CostModel':
+        for i in range(len(self.symbols)):
+            self.ins_cost(i)
+            self.del_cost(i)
+            for j in range(len(self.symbols)):
+                self.sub_cost(i, j)
+        return self
+
+    def __call__(self, d_in : str, d_out : str) -> float:
+        # drop-in replacement for cost_fn
+        if d_in == '':
+            return self.ins_cost(self.symbol_id(d_out))
+        if d_out == '':
+            return self.del_cost(self.symbol_id(d_in))
+        return self.sub_cost(self.symbol_id(d_in), self.symbol_id(d_out))
+
+    def verify(self, cost_fn : Callable[[str, str], float]) -> List[Tuple[str, str, float, float]]:
+        # (d_in, d_out, compiled, expected) for every entry over the inventory that differs from cost_fn,
+        # a reference independent of the one the tables were filled from
+        self.compile()
+        mismatches = []
+        for i, d_in in enumerate(self.symbols):
+            checks = [('', d_in, self.ins_costs[i]), (d_in, '', self.del_costs[i])]
+            checks += [(d_in, d_out, self.sub_costs[i][j]) for j, d_out in enumerate(self.symbols)]
+            for a, b, compiled in checks:
+                expected = cost_fn(a, b)
+                if compiled != expected:
+                    mismatches.append((a, b, compiled, expected))
+        return mismatches
+
+def compact_distance(w1 : str|List[str], w2 : str|List[str], cost_fn : Callable[[str, str], float] | CostModel = None,
+                     max_cost : float = None) -> CostMatrix | None:
+    # same recurrence as distance(), including max_cost; costs come from a CostModel (a plain cost_fn gets
+    # a throwaway one, so it is called once per symbol or symbol pair)
+    if cost_fn is None:
+        cost_fn = lambda i, o : 1
+    cost_model = cost_fn if isinstance(cost_fn, CostModel) else CostModel(cost_fn, compile=False)
+
+    w1, w2 = add_BOS_EOS(w1), add_BOS_EOS(w2)
+    matrix = CostMatrix(w1, w2)
+    rows, cols = matrix.rows, matrix.cols
+    costs, moves = matrix.costs, matrix.moves
+    for i in range(1, rows):
+        costs[i * cols] = i
+        moves[i * cols] = DEL_MOVE
+    for j in range(1, cols):
+        costs[j] = j
+        moves[j] = INS_MOVE
+    ids1, ids2 = cost_model.encode(w1), cost_model.encode(w2)
+    ins_costs = [0] + [cost_model.ins_cost(b) for b in ids2[1:]]
+    sub_costs = cost_model.sub_costs
+    k_lo, k_hi = -(rows - 1), cols - 1
+    if max_cost is not None: # edges cost 1 per step
+        min_del = min([1] + [cost_model.del_cost(a) for a in ids1[1:]])
+        k_lo, k_hi = _diagonal_band(rows, cols, min_del, min([1] + ins_costs[1:]), max_cost)
+        if k_lo > k_hi:
+            return None
+        for i in range(1, rows): # cells outside the band stay at inf
+            costs[i * cols + 1:(i + 1) * cols] = array('d', [math.inf]) * (cols - 1)
+    for i in range(1, rows):
+        row, prev_row = i * cols, (i - 1) * cols
+        a = ids1[i]
+        del_cost, sub_row = cost_model.del_cost(a), sub_costs[a]
+        j_start, j_stop = max(1, i + k_lo), min(cols - 1, i + k_hi) # band columns of row i
+        for j in range(j_start, j_stop + 1):
+            b = ids2[j]
+            if a == b:
+                substitution_cost = 0
+            else:
+                substitution_cost = sub_row[b]
+                if substitution_cost is None:
+                    substitution_cost = cost_model.sub_cost(a, b)
+            del_total = costs[prev_row + j] + del_cost
+            ins_total = costs[row + j - 1] + ins_costs[j]
+            sub_total = costs[prev_row + j - 1] + substitution_cost
+            min_cost = min(del_total, ins_total, sub_total)
+            move = 0
+            if del_total == min_cost:
+                move |= DEL_MOVE
+            if ins_total == min_cost:
+                move |= INS_MOVE
+            if sub_total == min_cost:
+                move |= SUB_MOVE if substitution_cost else NOP_MOVE
+            costs[row + j] = min_cost
+            moves[row + j] = move
+        if max_cost is not None and min(costs[row + max(0, i + k_lo):row + j_stop + 1]) > max_cost:
+            return None
+    if max_cost is not None and costs[rows * cols - 1] > max_cost:
+        return None
     return matrix
 
 @dataclasses.dataclass
@@ -193,34 +405,245 @@ def _change_sequence_cost(c_seq : ChangeSequence) -> int:
     return len(set(c_seq))
 
 
-def find_change_sequences(matrix : ModMatrix, pos : Position = None) -> List[ChangeSequence]:
+def _trail_to_sequence(trail : tuple) -> ChangeSequence:
+    # trail is a linked list (d_in, d_out, cost, next) running from the first change to the last
+    c_seq = [Transition(BOS, BOS)] # beginning of string
+    while trail is not None:
+        d_in, d_out, cost, trail = trail
+        c_seq.append(Transition(d_in=d_in, d_out=d_out, cost=cost))
+    return c_seq
+
+def iter_change_sequences(matrix : ModMatrix|CostMatrix, pos : Position = None,
+                          max_paths : int = None) -> Iterator[ChangeSequence]:
+    # yields the same sequences, in the same order, as the full enumeration, one at a time
+    if pos is None:
+        pos = (matrix.rows-1, matrix.cols-1)
+    if max_paths is not None and max_paths <= 0:
+        return
+    count = 0
+    stack = [(pos, None)]
+    while stack:
+        pos, trail = stack.pop()
+        if pos == (0, 0):
+            yield _trail_to_sequence(trail)
+            count += 1
+            if max_paths is not None and count >= max_paths:
+                return
+            continue
+        for mod in reversed(matrix.at(pos).modifications): # first option ends up on top
+            stack.append((mod.from_pos, (mod.op.d_in, mod.op.d_out, mod.cost, trail)))
+
+def best_change_sequence(matrix : ModMatrix|CostMatrix, step_cost : Callable[[Transition], float] = None,
+                         pos : Position = None) -> ChangeSequence | None:
+    # the optimal alignment minimizing the sum of step_cost over its transitions, without enumerating
+    # the others; ties go to the sequence that comes first in iter_change_sequences order
+    if step_cost is None:
+        step_cost = lambda t : 1
     if pos is None:
         pos = (matrix.rows-1, matrix.cols-1)
-    if pos == (0, 0):
-        return [[Transition(BOS, BOS)]] # beginning of string
-    mod_paths : List[ChangeSequence] = []
-    for mod in matrix.at(pos).modifications:
-        new_paths = find_change_sequences(matrix, mod.from_pos)
-        if new_paths is None:
+    best : dict[Position, tuple[float, Modification | None]] = {(0, 0): (0, None)}
+    stack = [pos]
+    while stack: # post-order: a cell is scored once all its predecessors are
+        cell_pos = stack[-1]
+        if cell_pos in best:
+            stack.pop()
             continue
-        for path in new_paths:
-            # path.append((pos[0], mod))
-            path.append(Transition(d_in=mod.op.d_in, d_out=mod.op.d_out, cost=mod.cost))
-        mod_paths.extend(new_paths)
-    return mod_paths
+        modifications = matrix.at(cell_pos).modifications
+        pending = [m.from_pos for m in modifications if m.from_pos not in best]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        cell_best = (math.inf, None)
+        for mod in modifications:
+            step = Transition(d_in=mod.op.d_in, d_out=mod.op.d_out, cost=mod.cost)
+            score = best[mod.from_pos][0] + step_cost(step)
+            if score < cell_best[0]:
+                cell_best = (score, mod)
+        best[cell_pos] = cell_best
+    if best[pos][0] == math.inf:
+        return None
+    trail = None
+    while pos != (0, 0):
+        mod = best[pos][1]
+        trail = (mod.op.d_in, mod.op.d_out, mod.cost, trail)
+        pos = mod.from_pos
+    return _trail_to_sequence(trail)
+
+def find_change_sequences(matrix : ModMatrix|CostMatrix, pos : Position = None,
+                          max_paths : int = None) -> List[ChangeSequence]:
+    return list(iter_change_sequences(matrix, pos, max_paths))
+
+def _common_affix_lengths(w1 : str|List[str], w2 : str|List[str]) -> Tuple[int, int]:
+    # lengths of the shared prefix and of the shared suffix of the rest
+    limit = min(len(w1), len(w2))
+    prefix = 0
+    while prefix < limit and w1[prefix] == w2[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and w1[-1 - suffix] == w2[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+def _restore_affixes(c_seq : ChangeSequence, prefix : List[str], suffix : List[str]) -> ChangeSequence:
+    # puts the trimmed symbols back as NOPs; transition costs are cumulative and NOPs cost 0,
+    # so the prefix NOPs cost 0 and the suffix NOPs the total, like the final EOS
+    return ([c_seq[0]] + [Transition(d_in=s, d_out=s, cost=0.0) for s in prefix] + c_seq[1:-1]
+            + [Transition(d_in=s, d_out=s, cost=c_seq[-1].cost) for s in suffix] + [c_seq[-1]])
+
+def _trim_is_exact(cost_model : CostModel, w1 : str|List[str], w2 : str|List[str]) -> bool:
+    # Trimming shared affixes keeps the cost when the DP is a plain edit distance over a metric: the first
+    # row and column charge 1 per step, so insertions and deletions must cost 1, and the costs over the
+    # symbols of both words (and the empty symbol) must obey the triangle inequality. Matches cost 0.
+    ids = sorted(set(cost_model.encode(add_BOS_EOS(list(w1)) + add_BOS_EOS(list(w2)))))
+    if any([cost_model.ins_cost(i) != 1 or cost_model.del_cost(i) != 1 for i in ids]):
+        return False
+    def cost(a : int | None, b : int | None) -> float:
+        if a == b:
+            return 0
+        if a is None:
+            return cost_model.ins_cost(b)
+        if b is None:
+            return cost_model.del_cost(a)
+        return cost_model.sub_cost(a, b)
+    points = [None] + ids
+    return all([cost(x, z) <= cost(x, y) + cost(y, z) + 1e-9 for x in points for y in points for z in points])
+
+class TransformationCache:
+    # bounded LRU of computed change sequences, optionally backed by an sqlite file; values are plain
+    # (d_in, d_out, cost) lists, so every lookup builds fresh Transitions
+    def __init__(self, max_size : int = 4096, filename : str = None):
+        self.max_size = max_size
+        self.entries : OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.connection = None
+        if filename is not None:
+            self.connection = sqlite3.connect(filename)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS transformations (key TEXT PRIMARY KEY, value TEXT)')
+            self.connection.commit()
+
+    def get(self, key : str) -> dict | None:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.connection is not None:
+            row = self.connection.execute('SELECT value FROM transformations WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                value = json.loads(row[0])
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def _remember(self, key : str, value : dict):
+        self.entries[key] = value
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def put(self, key : str, value : dict):
+        self._remember(key, value)
+        if self.connection is not None:
+            self.connection.execute('INSERT OR REPLACE INTO transformations VALUES (?, ?)', (key, json.dumps(value)))
+            self.connection.commit()
+
+    def info(self) -> dict:
+        return {'hits':self.hits, 'disk_hits':self.disk_hits, 'misses':self.misses,
+                'size':len(self.entries), 'max_size':self.max_size}
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+        if self.connection is not None:
+            self.connection.execute('DELETE FROM transformations')
+            self.connection.commit()
+
+_transformation_cache : TransformationCache | None = None
+
+def set_transformation_cache(cache : TransformationCache | None):
+    # off (None) by default; entries are only stored for costs with a key, see compute_change_sequences
+    global _transformation_cache
+    _transformation_cache = cache
+
+def transformation_cache_info() -> dict | None:
+    return _transformation_cache.info() if _transformation_cache is not None else None
+
+def transformation_cache_clear():
+    if _transformation_cache is not None:
+        _transformation_cache.clear()
 
 class WordTransformation:
-    def __init__(self, initial : str, final : str, cost_fn : Callable[[str, str], float] = None):
+    def __init__(self, initial : str, final : str, cost_fn : Callable[[str, str], float] | CostModel = None,
+                 trim : bool = False):
         self.initial = initial
         self.final = final
         self.min_changes = simple_string_distance(self.initial, self.final)
         self.change_sequences = None
+        self.cost = None
         if cost_fn is not None:
-            self.compute_change_sequences(cost_fn)
+            self.compute_change_sequences(cost_fn, trim=trim)
+
+    def _compute(self, cost_fn : Callable[[str, str], float] | CostModel, max_paths : int,
+                 best_by : Callable[[Transition], float], max_cost : float, trim : bool) -> tuple:
+        # a plain cost_fn cannot be checked for the triangle inequality beyond the symbols seen here, so only
+        # unit costs and CostModels are trimmed
+        trim = trim and (cost_fn is None or isinstance(cost_fn, CostModel))
+        if cost_fn is None:
+            cost_fn = lambda i, o : 1
+        cost_model = cost_fn if isinstance(cost_fn, CostModel) else CostModel(cost_fn, compile=False)
+        prefix, suffix = (0, 0)
+        if trim and _trim_is_exact(cost_model, self.initial, self.final):
+            prefix, suffix = _common_affix_lengths(self.initial, self.final)
+        end1, end2 = len(self.initial) - suffix, len(self.final) - suffix
+        matrix = compact_distance(self.initial[prefix:end1], self.final[prefix:end2], cost_model, max_cost)
+        if matrix is None:
+            return math.inf, []
+        if best_by is not None:
+            best = best_change_sequence(matrix, best_by)
+            change_sequences = [best] if best is not None else []
+        else:
+            change_sequences = find_change_sequences(matrix, max_paths=max_paths)
+        if prefix or suffix:
+            change_sequences = [_restore_affixes(c_seq, list(self.initial[:prefix]), list(self.initial[end1:]))
+                                for c_seq in change_sequences]
+        return matrix.cost(matrix.rows-1, matrix.cols-1), change_sequences
 
-    def compute_change_sequences(self, cost_fn : Callable[[str, str], float] = None):
-        matrix = distance(self.initial, self.final, cost_fn)
-        self.change_sequences = find_change_sequences(matrix)
+    def compute_change_sequences(self, cost_fn : Callable[[str, str], float] | CostModel = None,
+                                 max_paths : int = None, best_by : Callable[[Transition], float] = None,
+                                 max_cost : float = None, trim : bool = False, cache_key : str = None):
+        # best_by keeps only the sequence with the lowest summed best_by score; max_paths caps enumeration.
+        # Over max_cost, cost is inf and there are no change sequences.
+        # trim aligns only what lies between the shared prefix and suffix, which come back as NOPs. It is
+        # skipped unless the costs are unit or a CostModel with unit insertions/deletions that obeys the
+        # triangle inequality over both words (see _trim_is_exact), where the cost is unchanged. Alignments
+        # that tie by moving a shared symbol (as -> ass) are then listed once, so the sequences are a subset
+        # of the full list.
+        # With a TransformationCache set (see set_transformation_cache), results are stored under cache_key,
+        # which must identify cost_fn and best_by, or else under the CostModel's key (unit costs: 'unit');
+        # calls with no key, or with best_by and no cache_key, are not cached.
+        if cache_key is None and best_by is None:
+            if cost_fn is None:
+                cache_key = 'unit'
+            elif isinstance(cost_fn, CostModel):
+                cache_key = cost_fn.key
+        key, cached = None, None
+        if _transformation_cache is not None and cache_key is not None:
+            key = json.dumps([list(self.initial), list(self.final), cache_key, max_paths, max_cost, trim],
+                             ensure_ascii=False)
+            cached = _transformation_cache.get(key)
+            if cached is not None:
+                self.cost = cached['cost']
+                self.change_sequences = [[Transition(d_in=d_in, d_out=d_out, cost=cost) for d_in, d_out, cost in c_seq]
+                                         for c_seq in cached['sequences']]
+        if cached is None:
+            self.cost, self.change_sequences = self._compute(cost_fn, max_paths, best_by, max_cost, trim)
+            if key is not None:
+                sequences = [[(t.d_in, t.d_out, t.cost) for t in c_seq] for c_seq in self.change_sequences]
+                _transformation_cache.put(key, {'cost':self.cost, 'sequences':sequences})
         for change_seq in self.change_sequences: # assign befores and afters
             for i, change in enumerate(change_seq):
                 if i != 0: